@@ -0,0 +1,108 @@
+# benchmarks/import_time.py
+"""
+Startup import report: imports `main` in a fresh interpreter under `-X importtime` and
+summarizes where the time goes, like `python -X importtime -c "import main"` but sorted.
+
+Fails (exit status 1) when a module that should only be loaded on first use is imported
+at startup (--forbid, by default SymPy, NumPy, the ANTLR runtime and the OpenAI SDK), or
+when the total exceeds --budget-ms. Run it in CI to catch startup regressions.
+
+With --first-check it also times, in another fresh interpreter, the first answer
+verification on a cold AnswerVerifier pool (worker spawn plus the SymPy import), which is
+what VERIFY_ANSWER_WARMUP moves off the first request.
+
+Usage: python -m benchmarks.import_time [--module main] [--top 15] [--budget-ms 0]
+       [--forbid sympy,numpy,antlr4,openai] [--first-check]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_CHECK = """
+import asyncio, json, time
+from routes.verify_answer import AnswerVerifier
+
+async def main():
+    verifier = AnswerVerifier(workers=1)
+    try:
+        started = time.perf_counter()
+        await verifier.verify([("\\\\frac{1}{2}", "latex")], [("0.5", "text")], "or")
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        await verifier.verify([("\\\\frac{1}{3}", "latex")], [("2/6", "text")], "or")
+        warm = time.perf_counter() - started
+    finally:
+        verifier.shutdown()
+    print(json.dumps({"coldMs": round(cold * 1000, 1), "warmMs": round(warm * 1000, 1)}))
+
+if __name__ == "__main__":
+    asyncio.run(main())
+"""
+
+def import_times(module: str) -> list:
+    """(module, self_us, cumulative_us, depth) for every import made by `import module`."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def first_check() -> dict:
+    completed = subprocess.run([sys.executable, "-c", FIRST_CHECK], cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr[-2000:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main(args) -> int:
+    rows = import_times(args.module)
+    total_us = next((cumulative for name, _, cumulative, _ in rows if name == args.module), sum(r[1] for r in rows))
+    imported = {name for name, _, _, _ in rows}
+    forbid = [name for name in args.forbid.split(",") if name]
+    violations = sorted(name for name in imported if name.split(".")[0] in forbid)
+    # Top-level packages by cumulative time, so e.g. all of sympy shows up as one line
+    packages = {}
+    for name, self_us, _, _ in rows:
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+    report = {
+        "module": args.module,
+        "totalMs": round(total_us / 1000, 1),
+        "modules": len(rows),
+        "topPackagesMs": {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]},
+        "topSelfMs": {name: round(self_us / 1000, 1) for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]},
+        "forbiddenImported": sorted({name.split(".")[0] for name in violations}),
+    }
+    if args.first_check:
+        report["firstCheck"] = first_check()
+    print(json.dumps(report, indent=2))
+
+    failed = False
+    if violations:
+        print(f"Imported at startup but should be lazy: {', '.join(violations[:10])}", file=sys.stderr)
+        failed = True
+    if args.budget_ms and total_us / 1000 > args.budget_ms:
+        print(f"import {args.module} took {total_us / 1000:.0f} ms, over the {args.budget_ms} ms budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when the import takes longer; 0 disables")
+    parser.add_argument("--forbid", default="sympy,numpy,antlr4,openai", help="comma-separated top-level packages that must not be imported at startup")
+    parser.add_argument("--first-check", action="store_true")
+    sys.exit(main(parser.parse_args()))
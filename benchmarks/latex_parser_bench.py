@@ -0,0 +1,189 @@
+# benchmarks/latex_parser_bench.py
+"""
+latex_parser benchmark and differential check: compares parse_mixed_content_with_original
+against a verbatim copy of the previous character-by-character implementation.
+
+The differential pass parses randomly generated marked-up content (including unmatched
+markers, empty segments and every _CMD_LATEX_ placeholder) with both implementations and
+fails on the first difference. The timing pass parses realistic generated questions of
+10 KB to 200 KB.
+
+Usage: python -m benchmarks.latex_parser_bench [--cases 5000] [--sizes 10,50,200] [--repeat 3]
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import time
+from routes.latex_parser import parse_mixed_content_with_original
+
+# The legacy copy logs every segment at INFO; its f-strings are still built, as they were in
+# production, but nothing is emitted
+legacy_logger = logging.getLogger("benchmarks.latex_parser_bench.legacy")
+legacy_logger.setLevel(logging.ERROR)
+logging.getLogger("routes.latex_parser").setLevel(logging.ERROR)
+
+def legacy_parse_mixed_content_with_original(content):
+    logger = legacy_logger
+    if not content or not isinstance(content, str):
+        return [{"value": "", "type": "text", "original_latex": None}]
+
+    logger.info(f"Debug: Starting parse_mixed_content_with_original with content length {len(content)}")
+    logger.info(f"Debug: Initial content: {content}")
+
+    if (content.startswith('_FLG_LATEX_INLINE_START_') and
+        content.endswith('_FLG_LATEX_INLINE_END_')):
+        content = '\\(' + content[len('_FLG_LATEX_INLINE_START_'):-len('_FLG_LATEX_INLINE_END_')] + '\\)'
+        logger.info(f"Debug: Replaced _FLG_LATEX_INLINE_START_ and _FLG_LATEX_INLINE_END_ with \\( and \\), new content: {content}")
+
+    result = []
+    current_pos = 0
+    i = 0
+
+    while i < len(content):
+        if content.startswith('_FLG_LATEX_INLINE_START_', i):
+            if current_pos < i:
+                result.append({"value": content[current_pos:i].strip(), "type": "text", "original_latex": content[current_pos:i].strip()})
+            start = i
+            i += len('_FLG_LATEX_INLINE_START_')
+            logger.info(f"Debug: Found _FLG_LATEX_INLINE_START_ at position {start}")
+            while i < len(content) and not content.startswith('_FLG_LATEX_INLINE_END_', i):
+                i += 1
+            if i < len(content) and content.startswith('_FLG_LATEX_INLINE_END_', i):
+                logger.info(f"Debug: Found _FLG_LATEX_INLINE_END_ at position {i}")
+                original_latex = content[start:i + len('_FLG_LATEX_INLINE_END_')]
+                inner_content = content[start + len('_FLG_LATEX_INLINE_START_'):i]
+                result.append({"value": '\\(' + inner_content + '\\)', "type": "latex", "original_latex": original_latex})
+                current_pos = i + len('_FLG_LATEX_INLINE_END_')
+                i += len('_FLG_LATEX_INLINE_END_')
+            else:
+                logger.warning(f"Unmatched _FLG_LATEX_INLINE_START_ at position {start}, treating remainder as text")
+                result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
+                break
+
+        elif content.startswith('_FLG_LATEX_CENTER_START_', i):
+            if current_pos < i:
+                result.append({"value": content[current_pos:i].strip(), "type": "text", "original_latex": content[current_pos:i].strip()})
+            start = i
+            i += len('_FLG_LATEX_CENTER_START_')
+            logger.info(f"Debug: Found _FLG_LATEX_CENTER_START_ at position {start}")
+            while i < len(content) and not content.startswith('_FLG_LATEX_CENTER_END_', i):
+                i += 1
+            if i < len(content) and content.startswith('_FLG_LATEX_CENTER_END_', i):
+                logger.info(f"Debug: Found _FLG_LATEX_CENTER_END_ at position {i}")
+                original_latex = content[start:i + len('_FLG_LATEX_CENTER_END_')]
+                inner_content = content[start + len('_FLG_LATEX_CENTER_START_'):i]
+                result.append({"value": '\\(' + inner_content + '\\)', "type": "latex", "original_latex": original_latex})
+                current_pos = i + len('_FLG_LATEX_CENTER_END_')
+                i += len('_FLG_LATEX_CENTER_END_')
+            else:
+                logger.warning(f"Unmatched _FLG_LATEX_CENTER_START_ at position {start}, treating remainder as text")
+                result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
+                break
+
+        else:
+            i += 1
+
+    if current_pos < len(content):
+        result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
+
+    for segment in result:
+        segment["value"] = segment["value"].replace("_CMD_LATEX_CDOT-", "\\cdot")
+        segment["value"] = segment["value"].replace("_CMD_LATEX_INT-", "\\int")
+        segment["value"] = segment["value"].replace("_CMD_LATEX_SUM-", "\\sum")
+        segment["value"] = re.sub(r'_CMD_LATEX_TEXTBF_START_([^]_CMD_LATEX_TEXTBF_END_]+)_CMD_LATEX_TEXTBF_END_', r'\\textbf{\1}', segment["value"])
+        segment["value"] = re.sub(r'_CMD_LATEX_FRACTION_START-([^]_CMD_LATEX_FRACTION_END_]+)_CMD_LATEX_FRACTION_END_([^}-]+)', r'\\frac{\1}{\2}', segment["value"])
+        segment["value"] = segment["value"].replace("_BACKSLASH_", "\\")
+        segment["value"] = segment["value"].replace("_CMD_LATEX_", "\\")
+
+    for idx, segment in enumerate(result):
+        logger.info(f"Segment {idx}: value='{segment['value']}', type='{segment['type']}', original_latex='{segment['original_latex']}'")
+
+    return result
+
+# Building blocks for generated content; partial markers and bare underscores exercise the edge cases
+FUZZ_TOKENS = [
+    "x", "y", " ", "  ", "\n", "_", "-", "}", "2", "Solve for x. ",
+    "_FLG_LATEX_INLINE_START_", "_FLG_LATEX_INLINE_END_", "_FLG_LATEX_CENTER_START_", "_FLG_LATEX_CENTER_END_",
+    "_FLG_LATEX_", "_FLG_LATEX_INLINE_", "START_", "_END_",
+    "_CMD_LATEX_CDOT-", "_CMD_LATEX_INT-", "_CMD_LATEX_SUM-", "_CMD_LATEX_", "_BACKSLASH_",
+    "_CMD_LATEX_TEXTBF_START_", "_CMD_LATEX_TEXTBF_END_", "_CMD_LATEX_FRACTION_START-", "_CMD_LATEX_FRACTION_END_",
+    "bold", "ab", "3", "4",
+]
+
+def fuzz_content(rng: random.Random) -> str:
+    return "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 40)))
+
+def realistic_question(rng: random.Random, size_kb: int) -> str:
+    """A long worked problem: prose with inline formulas, centered equations and LaTeX placeholders."""
+    parts = []
+    size = 0
+    while size < size_kb * 1024:
+        a, b, c = rng.randint(1, 99), rng.randint(1, 99), rng.randint(1, 99)
+        part = rng.choice([
+            f"Step {a}: simplify the expression and explain each transformation in words. ",
+            f"_FLG_LATEX_INLINE_START_{a}x + {b} = {c}_FLG_LATEX_INLINE_END_ ",
+            f"_FLG_LATEX_CENTER_START__CMD_LATEX_FRACTION_START-{a}_CMD_LATEX_FRACTION_END_{b} _CMD_LATEX_CDOT- {c}_FLG_LATEX_CENTER_END_",
+            f"_FLG_LATEX_INLINE_START__CMD_LATEX_SUM-_{{i=1}}^{{{a}}} i^2_FLG_LATEX_INLINE_END_ ",
+            f"Note that _CMD_LATEX_TEXTBF_START_important_CMD_LATEX_TEXTBF_END_ terms cancel. ",
+            "\n",
+        ])
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+def differential(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    samples = [
+        "", "_FLG_LATEX_INLINE_START_FLG_LATEX_INLINE_END_",
+        "_FLG_LATEX_INLINE_START_2x + 3y = 11_FLG_LATEX_INLINE_END_",
+        "Text _FLG_LATEX_INLINE_START_x + y unmatched",
+        "_FLG_LATEX_CENTER_START_x",
+    ]
+    samples += [fuzz_content(rng) for _ in range(cases)]
+    samples += [realistic_question(rng, 10) for _ in range(3)]
+    for content in samples:
+        expected = legacy_parse_mixed_content_with_original(content)
+        actual = parse_mixed_content_with_original(content)
+        if actual != expected:
+            print(json.dumps({"content": content, "expected": expected, "actual": actual}, indent=2))
+            return 1
+    print(f"differential: {len(samples)} inputs, outputs identical")
+    return 0
+
+def _best_of(fn, content: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def timing(sizes: list, repeat: int, seed: int) -> list:
+    rng = random.Random(seed)
+    report = []
+    for size_kb in sizes:
+        content = realistic_question(rng, size_kb)
+        legacy = _best_of(legacy_parse_mixed_content_with_original, content, repeat)
+        current = _best_of(parse_mixed_content_with_original, content, repeat)
+        report.append({
+            "sizeKb": size_kb,
+            "segments": len(parse_mixed_content_with_original(content)),
+            "legacyMs": round(legacy * 1000, 2),
+            "currentMs": round(current * 1000, 2),
+            "speedup": round(legacy / current, 1) if current else None,
+        })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated content sizes in KB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=12)
+    args = parser.parse_args()
+    if differential(args.cases, args.seed):
+        sys.exit(1)
+    print(json.dumps(timing([int(s) for s in args.sizes.split(",")], args.repeat, args.seed), indent=2))
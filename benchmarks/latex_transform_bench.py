@@ -0,0 +1,187 @@
+# benchmarks/latex_transform_bench.py
+"""
+question_generator_xai.process_latex_in_text: golden-file check, differential check and
+microbenchmark against a verbatim copy of the previous multi-pass implementation.
+
+- Golden files: benchmarks/golden/latex_transform/<case>.txt holds a raw model response and
+  <case>.expected the marker output it must produce. --update rewrites the .expected files
+  from the legacy implementation.
+- Differential: random LaTeX-heavy strings through both implementations.
+- Timing: long multi-paragraph generations of increasing size.
+
+Usage: python -m benchmarks.latex_transform_bench [--cases 5000] [--sizes 4,32,256] [--update]
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from routes.question_generator_xai import process_latex_in_text
+
+GOLDEN_DIR = Path(__file__).parent / "golden" / "latex_transform"
+
+logger = logging.getLogger(__name__)
+
+# Unmatched delimiters are expected in the generated input
+logging.getLogger("routes.question_generator_xai").setLevel(logging.ERROR)
+logger.setLevel(logging.ERROR)
+
+# Frozen copy of the helpers the previous implementation chained; the reference for the checks below
+def replace_dollar_number(text):
+    """
+    Replace all occurrences of a dollar sign ($) immediately followed by a digit
+    with '_CMD_DOLLAR_' in the given string.
+    Args:
+        text (str): The input string.
+    Returns:
+        str: The modified string with replacements.
+    """
+    return re.sub(r'\$\d', lambda m: '_CMD_DOLLAR_' + m.group(0)[1], text)
+
+def replace_latex_inline_pairs(text, start_delimiter, end_delimiter, new_start_delimiter, new_end_delimiter):
+    """
+    Find all pairs of start and end delimiters in the text and replace them with
+    '_FLG_LATEX_INLINE_START_' and '_FLG_LATEX_INLINE_END_'.
+    Handles identical delimiters (e.g., '$') without nesting support.
+    Args:
+        text (str): The input string.
+        start_delimiter (str): The starting delimiter (default: '\(').
+        end_delimiter (str): The ending delimiter (default: '\)').
+    Returns:
+        str: The modified string with replacements.
+    """
+    result = []
+    i = 0
+    in_delimiter = False
+    while i < len(text):
+        if text[i:i+len(start_delimiter)] == start_delimiter and not in_delimiter:
+            result.append("_FLG_LATEX_INLINE_START_")
+            in_delimiter = True
+            start_pos = i + len(start_delimiter)
+            i += len(start_delimiter)
+        elif text[i:i+len(end_delimiter)] == end_delimiter and in_delimiter:
+            result.append(text[start_pos:i])
+            result.append("_FLG_LATEX_INLINE_END_")
+            in_delimiter = False
+            i += len(end_delimiter)
+        else:
+            if not in_delimiter:
+                result.append(text[i])
+            i += 1
+    # Handle any remaining unmatched start delimiter
+    if in_delimiter:
+        result.append(text[start_pos:])
+        logger.warning(f"Unmatched {start_delimiter} delimiter detected, treating remainder as text")
+    return "".join(result)
+
+def legacy_process_latex_in_text(content):
+    content = replace_dollar_number(content)
+    content = content.replace("\\n\\n", "_CMD_NEWLINE_")
+    content = content.replace("\\n", "_CMD_NONE_")
+    content = content.replace("\\\\", "\\")
+    content = re.sub(r'\\\[(.*?)\\\]', r'_CMD_LATEX_BLOCK_CENTER_START-\1_CMD_LATEX_BLOCK_CENTER_END_', content)
+    content = re.sub(r'\\([a-zA-Z]+)', r'_CMD_LATEX_\1', content)
+    content = content.replace("\\", "_BACKSLASH_")
+    content = replace_latex_inline_pairs(content, start_delimiter='$', end_delimiter='$', new_start_delimiter="_FLG_LATEX_INLINE_START_", new_end_delimiter="_FLG_LATEX_INLINE_END_")
+    content = replace_latex_inline_pairs(content, start_delimiter='\\(', end_delimiter='\\)', new_start_delimiter="_FLG_LATEX_INLINE_START_", new_end_delimiter="_FLG_LATEX_INLINE_END_")
+    content = replace_latex_inline_pairs(content, start_delimiter='\\[', end_delimiter='\\]', new_start_delimiter="_FLG_LATEX_CENTER_START_", new_end_delimiter="_FLG_LATEX_CENTER_END_")
+    content = re.sub(r'\\begin\{([^}]+)\}', r'_FLG_LATEX_BLOCK_START_\1-', content)
+    content = re.sub(r'\\end\{([^}]+)\}', r'_FLG_LATEX_BLOCK_END_\1-', content)
+    content = re.sub(r'\\textbf\{([^}]+)\}', r'_CMD_LATEX_TEXTBF_START_\1_CMD_LATEX_TEXTBF_END_', content)
+    content = re.sub(r'\\frac\{([^}]+)\}\{([^}]+)\}', r'_CMD_LATEX_FRACTION_START-\1_CMD_LATEX_FRACTION_END_\2-', content)
+    content = content.replace('\\cdot', '_CMD_LATEX_CDOT_')
+    content = content.replace('\\int', '_CMD_LATEX_INT_')
+    content = content.replace('\\sum', '_CMD_LATEX_SUM_')
+    return content
+
+FUZZ_TOKENS = [
+    "\\", "\\\\", "n", "nn", "\\n", "\\n\\n", "[", "]", "\\[", "\\]", "\\(", "\\)", "$", "$5", "5", "\n",
+    "frac", "{1}{2}", "cdot", "int", "sum", "begin{pmatrix}", "end{pmatrix}", "textbf{x}", "neq",
+    "x", " ", "_", "é", "٣",
+]
+
+def fuzz_content(rng: random.Random) -> str:
+    return "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 40)))
+
+def long_generation(rng: random.Random, size_kb: int) -> str:
+    """A JSON-encoded multi-paragraph model response, as it arrives from the API."""
+    paragraphs = []
+    size = 0
+    while size < size_kb * 1024:
+        a, b, c = rng.randint(1, 99), rng.randint(1, 99), rng.randint(2, 9)
+        paragraph = rng.choice([
+            f"A tank holds \\\\(\\\\frac{{{a}}}{{{c}}}\\\\) litres and loses ${b} worth of water per day. ",
+            f"Solve \\\\[ {a}x^{c} + {b}x - {c} = 0 \\\\] and check each root. ",
+            f"Evaluate $\\\\int_0^{{{c}}} x^{c} \\\\, dx$ and $\\\\sum_{{i=1}}^{{{a}}} i \\\\cdot {b}$. ",
+            f"\\\\textbf{{Step {a}:}} rewrite using \\\\begin{{pmatrix}} {a} & {b} \\\\\\\\ {c} & 1 \\\\end{{pmatrix}}. ",
+            "\\\\n\\\\n",
+        ])
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    return json.dumps({"question": "".join(paragraphs), "correctAnswer": "$x=1,y=2$"})
+
+def golden(update: bool) -> int:
+    failures = 0
+    cases = sorted(GOLDEN_DIR.glob("*.txt"))
+    for case in cases:
+        content = case.read_text()
+        expected_path = case.with_suffix(".expected")
+        if update:
+            expected_path.write_text(legacy_process_latex_in_text(content))
+            continue
+        if process_latex_in_text(content) != expected_path.read_text():
+            print(f"golden mismatch: {case.name}")
+            failures += 1
+    print(f"golden: {len(cases)} cases, {'updated' if update else f'{failures} failures'}")
+    return failures
+
+def differential(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    for _ in range(cases):
+        content = fuzz_content(rng)
+        expected = legacy_process_latex_in_text(content)
+        actual = process_latex_in_text(content)
+        if actual != expected:
+            print(json.dumps({"content": content, "expected": expected, "actual": actual}, indent=2))
+            return 1
+    print(f"differential: {cases} inputs, outputs identical")
+    return 0
+
+def _best_of(fn, content: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def timing(sizes: list, repeat: int, seed: int) -> list:
+    rng = random.Random(seed)
+    report = []
+    for size_kb in sizes:
+        content = long_generation(rng, size_kb)
+        assert process_latex_in_text(content) == legacy_process_latex_in_text(content)
+        legacy = _best_of(legacy_process_latex_in_text, content, repeat)
+        current = _best_of(process_latex_in_text, content, repeat)
+        report.append({
+            "sizeKb": size_kb,
+            "legacyMs": round(legacy * 1000, 2),
+            "currentMs": round(current * 1000, 2),
+            "speedup": round(legacy / current, 1) if current else None,
+        })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--sizes", default="4,32,256", help="comma-separated response sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--update", action="store_true", help="regenerate the golden .expected files from the legacy implementation")
+    args = parser.parse_args()
+    if golden(args.update) or differential(args.cases, args.seed):
+        sys.exit(1)
+    print(json.dumps(timing([int(s) for s in args.sizes.split(",")], args.repeat, args.seed), indent=2))
@@ -0,0 +1,135 @@
+# benchmarks/llm_client_bench.py
+"""
+LLM provider client benchmark against a local fake chat-completions server.
+
+The fake server speaks HTTP/1.1 with keep-alive, answers every request with a canned
+completion after --service-ms, and delays the first response on each new connection by
+--handshake-ms to stand in for the TCP + TLS round trips to a remote provider. The same
+--requests calls (--concurrency at a time) are made twice:
+
+  per-request  a new httpx.AsyncClient per call, as the handlers did before llm_clients
+  shared       llm_clients.get_client("mistral"), the lifespan-managed pooled client
+
+and the report gives latency percentiles plus how many connections each mode opened.
+
+Usage: python -m benchmarks.llm_client_bench [--requests 200] [--concurrency 8]
+       [--handshake-ms 40] [--service-ms 5] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+COMPLETION = json.dumps({"choices": [{"message": {"role": "assistant", "content": "x = 3"}}]}).encode()
+
+class FakeProvider:
+    """Minimal keep-alive HTTP/1.1 server; counts the connections it accepts."""
+
+    def __init__(self, handshake_ms: float, service_ms: float):
+        self.handshake = handshake_ms / 1000
+        self.service = service_ms / 1000
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.service + (self.handshake if first else 0))
+                first = False
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(COMPLETION)}\r\n\r\n".encode() + COMPLETION
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def _run(call, requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await call()
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+def _summary(latencies: list, elapsed: float, connections: int) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "connectionsOpened": connections,
+        "meanMs": round(statistics.mean(ordered), 2),
+        "p50Ms": round(ordered[len(ordered) // 2], 2),
+        "p95Ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+        "p99Ms": round(ordered[int(len(ordered) * 0.99) - 1], 2),
+        "throughputPerSec": round(len(ordered) / elapsed, 1),
+    }
+
+async def main(args) -> dict:
+    provider = FakeProvider(args.handshake_ms, args.service_ms)
+    server = await asyncio.start_server(provider.handle, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    # llm_clients reads its settings at import time
+    os.environ["AI_SERVER_URL"] = base_url
+    import llm_clients
+    from metrics import metrics
+
+    payload = {"prompt": "Solve 2x = 6"}
+    report = {"handshakeMs": args.handshake_ms, "serviceMs": args.service_ms, "concurrency": args.concurrency}
+    try:
+        async def per_request():
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                return await client.post(f"{base_url}/v1/chat/completions", json=payload)
+
+        async def shared():
+            return await llm_clients.get_client("mistral").post(llm_clients.CHAT_COMPLETIONS_PATH, json=payload)
+
+        for mode, call in (("perRequest", per_request), ("shared", shared)):
+            before = provider.connections
+            started = time.perf_counter()
+            latencies = await _run(call, args.requests, args.concurrency)
+            report[mode] = _summary(latencies, time.perf_counter() - started, provider.connections - before)
+        report["sharedMetrics"] = {
+            name: value for section in ("counters", "summaries")
+            for name, value in metrics.snapshot()[section].items() if name.startswith("llm.mistral.")
+        }
+        report["meanMsSaved"] = round(report["perRequest"]["meanMs"] - report["shared"]["meanMs"], 2)
+    finally:
+        await llm_clients.close()
+        server.close()
+        await server.wait_closed()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=40, help="extra delay on each new connection's first response")
+    parser.add_argument("--service-ms", type=float, default=5, help="server time per request")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    result = asyncio.run(main(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,82 @@
+# benchmarks/login_throughput.py
+"""
+Login throughput benchmark: compares verifying bcrypt passwords inline on the event loop
+(the old login path) with verifying them on the PasswordHasher pool.
+
+For each mode it fires a burst of concurrent logins while a probe coroutine measures how
+long other requests on the same worker wait for the event loop.
+
+Usage: python -m benchmarks.login_throughput [--logins 20] [--rounds 12] [--workers 2]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from bcrypt import hashpw, gensalt
+from routes.password_hashing import PasswordHasher, PasswordHasherBusy, pwd_context
+
+PASSWORD = "correct horse battery staple"
+
+async def _probe(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    # Stand-in for every other request on the worker: how late does it get scheduled?
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def _run_mode(mode: str, hashed: str, logins: int, hasher: PasswordHasher) -> dict:
+    async def login_inline():
+        await asyncio.sleep(0)  # the users.find_one round trip
+        return pwd_context.verify(PASSWORD, hashed)
+
+    async def login_pooled():
+        await asyncio.sleep(0)
+        try:
+            return await hasher.verify(PASSWORD, hashed)
+        except PasswordHasherBusy:
+            return None
+
+    login = login_inline if mode == "inline" else login_pooled
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode": mode,
+        "logins": logins,
+        "succeeded": sum(1 for r in results if r),
+        "rejected": sum(1 for r in results if r is None),
+        "elapsedSeconds": round(elapsed, 3),
+        "loginsPerSecond": round(logins / elapsed, 2),
+        "loopLagMsP50": round(statistics.median(lags_ms), 2),
+        "loopLagMsMax": round(lags_ms[-1], 2),
+    }
+
+async def main(args):
+    hashed = hashpw(PASSWORD.encode("utf-8"), gensalt(rounds=args.rounds)).decode("utf-8")
+    hasher = PasswordHasher(workers=args.workers, queue_limit=args.queue_limit)
+    try:
+        report = [
+            await _run_mode("inline", hashed, args.logins, hasher),
+            await _run_mode("pool", hashed, args.logins, hasher),
+        ]
+    finally:
+        hasher.shutdown()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-limit", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,321 @@
+# benchmarks/verify_answer_bench.py
+"""
+Answer verification benchmark: latency, throughput and verdict accuracy of the SymPy
+checks behind POST /api/verify-answer/ on a generated corpus of realistic
+(correctAnswer, studentAnswer, expected verdict) pairs.
+
+The corpus covers fractions, powers, factored/expanded polynomials, radicals, single
+equations (including "a=b" against "b=a"), "x=3,y=1" systems, large integers that differ
+by one and near-miss decimals, with equivalent rewrites and typical mistakes; it is
+seeded, so the same --pairs and --seed always give the same pairs. For each mode
+(fingerprint fast path on and off) the benchmark times parse_answer alone and the full
+verify_answers flow in this process (one core), starting from an empty expression cache,
+then optionally pushes the corpus through an AnswerVerifier pool. Accuracy is reported
+per family, with a few mismatches as examples.
+
+The report is printed (and written to --output) as JSON so releases can be compared.
+
+Usage: python -m benchmarks.verify_answer_bench [--pairs 2000] [--seed 7] [--modes fast,symbolic]
+       [--workers 2] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from math import gcd
+import routes.answer_verification as answer_verification
+from routes.answer_verification import ExpressionCache, ExpressionTimeout, VerificationError, parse_answer, verify_answers
+
+logging.getLogger("routes.answer_verification").setLevel(logging.ERROR)
+
+EXPRESSION_TIMEOUT = 2.0
+
+def _frac(numerator: int, denominator: int) -> str:
+    return f"\\frac{{{numerator}}}{{{denominator}}}"
+
+def _signed(value: int) -> str:
+    return f"+ {value}" if value >= 0 else f"- {-value}"
+
+def _fractions(rng: random.Random) -> tuple:
+    denominator = rng.choice([2, 3, 4, 5, 6, 8, 10, 12])
+    numerator = rng.randint(1, denominator * 2)
+    while gcd(numerator, denominator) != 1:
+        numerator += 1
+    correct = _frac(numerator, denominator)
+    k = rng.randint(2, 5)
+    terminating = all(p in (2, 5) for p in _prime_factors(denominator))
+    rewrites = [(_frac(numerator * k, denominator * k), "latex", True), (f"{numerator}/{denominator}", "text", True)]
+    if terminating:
+        rewrites.append((f"{numerator / denominator:g}", "text", True))
+    mistakes = [
+        (_frac(numerator + 1, denominator), "latex", False),
+        (_frac(denominator, numerator), "latex", numerator == denominator),
+        (_frac(numerator + k, denominator + k), "latex", False),
+    ]
+    return correct, rng.choice(rewrites + mistakes)
+
+def _prime_factors(n: int) -> list:
+    factors, p = [], 2
+    while n > 1:
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+        p += 1
+    return factors
+
+def _powers(rng: random.Random) -> tuple:
+    a, b = rng.randint(2, 6), rng.randint(2, 6)
+    var = rng.choice("xyab")
+    if rng.random() < 0.3:
+        n = rng.randint(3, 12)
+        return f"2^{{{n}}}", rng.choice([(str(2 ** n), "text", True), (str(2 ** n + 2), "text", False), (f"4^{{{n // 2}}} \\cdot 2^{{{n % 2}}}", "latex", True)])
+    correct = f"{var}^{{{a + b}}}"
+    return correct, rng.choice([
+        (f"{var}^{{{a}}} \\cdot {var}^{{{b}}}", "latex", True),
+        (f"\\frac{{{var}^{{{a + b + 1}}}}}{{{var}}}", "latex", True),
+        (f"{var}^{{{a * b}}}", "latex", a + b == a * b),
+        (f"({var}^{{{a}}})^{{{b}}}", "latex", a + b == a * b),
+    ])
+
+def _polynomials(rng: random.Random) -> tuple:
+    p, q = rng.choice([-1, 1]) * rng.randint(1, 9), rng.choice([-1, 1]) * rng.randint(1, 9)
+    expanded = f"x^{{2}} {_signed(p + q)}x {_signed(p * q)}"
+    factored = f"(x {_signed(p)})(x {_signed(q)})"
+    correct, rewrite = (factored, expanded) if rng.random() < 0.5 else (expanded, factored)
+    return correct, rng.choice([
+        (rewrite, "latex", True),
+        (f"(x {_signed(q)})(x {_signed(p)})", "latex", True),
+        (f"(x {_signed(-p)})(x {_signed(q)})", "latex", p == 0),
+        (f"x^{{2}} {_signed(p + q)}x {_signed(p * q + 1)}", "latex", False),
+    ])
+
+def _radicals(rng: random.Random) -> tuple:
+    k, m = rng.randint(2, 6), rng.choice([2, 3, 5, 6, 7])
+    correct = f"{k}\\sqrt{{{m}}}"
+    return correct, rng.choice([
+        (f"\\sqrt{{{k * k * m}}}", "latex", True),
+        (f"\\frac{{{k * m}}}{{\\sqrt{{{m}}}}}", "latex", True),
+        (f"{k + 1}\\sqrt{{{m}}}", "latex", False),
+        (f"\\sqrt{{{k * m}}}", "latex", False),
+    ])
+
+def _equations(rng: random.Random) -> tuple:
+    a = rng.randint(-9, 9)
+    kind = rng.random()
+    if kind < 0.2:
+        # Variables on both sides: the same equation written either way round
+        left, right = rng.choice([("a", "b"), ("y", "x")])
+        return f"{left}={right}", rng.choice([(f"{right}={left}", "latex", True), (f"{left} = {right}", "latex", True), (f"{left} = 2{right}", "latex", False)])
+    if kind < 0.6:
+        return f"x = {a}", rng.choice([(f"x={a}", "latex", True), (f"{a} = x", "latex", True), (f"x = {a + 1}", "latex", False), (f"x = {-a}", "latex", a == 0)])
+    m, c = rng.randint(1, 5), rng.randint(-5, 5)
+    correct = f"y = {m}x {_signed(c)}"
+    return correct, rng.choice([
+        (f"y = {c} + {m}x", "latex", True),
+        (f"y {_signed(-c)} = {m}x", "latex", True),
+        (f"y = {m + 1}x {_signed(c)}", "latex", False),
+        (f"y = {m}x {_signed(-c)}", "latex", c == 0),
+    ])
+
+def _systems(rng: random.Random) -> tuple:
+    a, b = rng.randint(-9, 9), rng.randint(-9, 9)
+    correct = f"x={a},y={b}"
+    return correct, rng.choice([
+        (f"x={a},y={b}", "latex", True),
+        (f"x = {a}, y = {b}", "latex", True),
+        (f"y={b},x={a}", "latex", True),
+        (f"x={a},y={b + 1}", "latex", False),
+        (f"x={b},y={a}", "latex", a == b),
+    ])
+
+def _large_integers(rng: random.Random) -> tuple:
+    # Values far above 1 that differ by one: a purely relative tolerance would accept the miss
+    if rng.random() < 0.5:
+        n = rng.randint(30, 45)
+        return f"2^{{{n}}}", rng.choice([(str(2 ** n), "latex", True), (str(2 ** n - 1), "latex", False), (str(2 ** n + 1), "latex", False)])
+    value = rng.randint(10 ** 10, 10 ** 12)
+    return str(value), rng.choice([(str(value), "text", True), (str(value + 1), "text", False), (f"{value}x", "latex", False)])
+
+def _near_misses(rng: random.Random) -> tuple:
+    # Rounded or slightly perturbed values the symbolic check rejects at 10 decimals
+    d = rng.choice([3, 7, 9, 11])
+    if rng.random() < 0.5:
+        return _frac(1, d), rng.choice([(f"{1 / d:.8f}", "text", False), (_frac(2, 2 * d), "latex", True)])
+    c = rng.randint(1, 9)
+    return f"x^{{2}} + {c}", rng.choice([(f"x^{{2}} + {c}.0000001", "latex", False), (f"{c} + x^{{2}}", "latex", True)])
+
+FAMILIES = {
+    "fractions": _fractions,
+    "powers": _powers,
+    "polynomials": _polynomials,
+    "radicals": _radicals,
+    "equations": _equations,
+    "systems": _systems,
+    "large_integers": _large_integers,
+    "near_misses": _near_misses,
+}
+
+def build_corpus(pairs: int, seed: int) -> list:
+    rng = random.Random(seed)
+    names = list(FAMILIES)
+    corpus = []
+    for i in range(pairs):
+        family = names[i % len(names)]
+        correct, (student, student_type, expected) = FAMILIES[family](rng)
+        corpus.append({"family": family, "correct": correct, "student": student, "studentType": student_type, "expected": expected})
+    return corpus
+
+def _percentiles(samples_ms: list) -> dict:
+    ordered = sorted(samples_ms)
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+    }
+
+def _reset_cache():
+    # Functions in answer_verification look the cache up as a module global
+    answer_verification.expression_cache = ExpressionCache()
+
+def _bench_parse(corpus: list) -> dict:
+    _reset_cache()
+    samples, failures = [], 0
+    for pair in corpus:
+        started = time.perf_counter()
+        try:
+            parse_answer(pair["student"], pair["studentType"])
+        except ValueError:
+            failures += 1
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"latencyMs": _percentiles(samples), "parseFailures": failures}
+
+def _verdict(pair: dict, timeout: float):
+    try:
+        result = verify_answers([(pair["correct"], "latex")], [(pair["student"], pair["studentType"])], "or", timeout)
+        return result["isCorrect"], result["results"][0].get("method", "symbolic")
+    except VerificationError:
+        return False, "invalid"
+    except ExpressionTimeout:
+        return None, "timeout"
+
+def _score(corpus: list, verdicts: list) -> dict:
+    by_family = {}
+    mismatches = []
+    for pair, (verdict, _) in zip(corpus, verdicts):
+        family = by_family.setdefault(pair["family"], {"pairs": 0, "correct": 0, "couldNotVerify": 0})
+        family["pairs"] += 1
+        if verdict is None:
+            family["couldNotVerify"] += 1
+        elif bool(verdict) == pair["expected"]:
+            family["correct"] += 1
+        elif len(mismatches) < 20:
+            mismatches.append({**pair, "verdict": verdict})
+    for family in by_family.values():
+        family["accuracy"] = round(family["correct"] / family["pairs"], 4)
+    total = sum(family["correct"] for family in by_family.values())
+    return {"accuracy": round(total / len(corpus), 4), "byFamily": by_family, "mismatchExamples": mismatches}
+
+def _bench_verify(corpus: list, timeout: float) -> dict:
+    _reset_cache()
+    samples, verdicts, methods = [], [], {}
+    started = time.perf_counter()
+    for pair in corpus:
+        pair_started = time.perf_counter()
+        verdict, method = _verdict(pair, timeout)
+        samples.append((time.perf_counter() - pair_started) * 1000)
+        verdicts.append((verdict, method))
+        methods[method] = methods.get(method, 0) + 1
+    elapsed = time.perf_counter() - started
+    return {
+        "latencyMs": _percentiles(samples),
+        "throughputPerCore": round(len(corpus) / elapsed, 2),
+        "methods": methods,
+        **_score(corpus, verdicts),
+    }
+
+async def _bench_pool(corpus: list, workers: int) -> dict:
+    from routes.verify_answer import AnswerVerifier
+    verifier = AnswerVerifier(workers=workers, queue_limit=workers * 4, expression_timeout=EXPRESSION_TIMEOUT)
+    slots = asyncio.Semaphore(workers * 4)
+
+    async def one(pair):
+        async with slots:
+            started = time.perf_counter()
+            result = await verifier.verify([(pair["correct"], "latex")], [(pair["student"], pair["studentType"])], "or")
+            return (time.perf_counter() - started) * 1000, result["isCorrect"]
+
+    try:
+        # Start the workers (interpreter + SymPy import) before timing
+        await asyncio.gather(*(verifier.verify([("1", "text")], [("1", "text")], "or") for _ in range(workers)))
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(pair) for pair in corpus), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        verifier.shutdown()
+    samples = [outcome[0] for outcome in outcomes if not isinstance(outcome, BaseException)]
+    return {
+        "workers": workers,
+        "latencyMs": _percentiles(samples) if samples else None,
+        "throughput": round(len(corpus) / elapsed, 2),
+        "throughputPerCore": round(len(corpus) / elapsed / workers, 2),
+        "errors": sum(1 for outcome in outcomes if isinstance(outcome, BaseException)),
+        "accuracy": round(sum(
+            1 for pair, outcome in zip(corpus, outcomes)
+            if not isinstance(outcome, BaseException) and outcome[1] is not None and bool(outcome[1]) == pair["expected"]
+        ) / len(corpus), 4),
+    }
+
+def _revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(args):
+    corpus = build_corpus(args.pairs, args.seed)
+    report = {
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "cpuCount": os.cpu_count(),
+        "pairs": len(corpus),
+        "seed": args.seed,
+        "expressionTimeout": EXPRESSION_TIMEOUT,
+        "modes": {},
+    }
+    fast_path = answer_verification.VERIFY_ANSWER_FAST_PATH
+    try:
+        for mode in args.modes.split(","):
+            answer_verification.VERIFY_ANSWER_FAST_PATH = mode == "fast"
+            report["modes"][mode] = {
+                "parseAnswer": _bench_parse(corpus),
+                "verify": _bench_verify(corpus, EXPRESSION_TIMEOUT),
+            }
+    finally:
+        answer_verification.VERIFY_ANSWER_FAST_PATH = fast_path
+    if args.workers:
+        # Pool workers read VERIFY_ANSWER_FAST_PATH from the environment
+        report["pool"] = asyncio.run(_bench_pool(corpus, args.workers))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--modes", default="fast,symbolic", help="comma-separated: fast (fingerprint fast path) and/or symbolic")
+    parser.add_argument("--workers", type=int, default=2, help="AnswerVerifier pool size; 0 skips the pool run")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    main(parser.parse_args())
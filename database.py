@@ -0,0 +1,137 @@
+# database.py
+import os
+import contextvars
+import threading
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from metrics import metrics
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "math_edu_db")
+# Requests issuing more database round trips than this are logged as likely N+1 patterns
+DB_ROUND_TRIP_BUDGET = int(os.getenv("DB_ROUND_TRIP_BUDGET", "25"))
+
+_client = None
+
+class RequestDbStats:
+    """Database round trips and time spent in them for one HTTP request."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = 0
+        self.duration_ms = 0.0
+        self.commands = {}
+
+    def record(self, command_name: str, duration_ms: float):
+        with self._lock:
+            self.operations += 1
+            self.duration_ms += duration_ms
+            self.commands[command_name] = self.commands.get(command_name, 0) + 1
+
+_request_db_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+def start_request_stats():
+    """Begin accounting for the current request; returns (stats, token) for reset_request_stats()."""
+    stats = RequestDbStats()
+    return stats, _request_db_stats.set(stats)
+
+def reset_request_stats(token):
+    _request_db_stats.reset(token)
+
+class _CommandAccounting(monitoring.CommandListener):
+    """
+    Counts every command sent on the shared client. Motor runs pymongo on a thread pool
+    but copies the caller's context into it, so the request's stats object is visible here.
+    Server heartbeats and other background commands have no request context and only
+    show up in the global counters.
+    """
+    def _record(self, event, failed: bool = False):
+        duration_ms = event.duration_micros / 1000.0
+        metrics.inc("db.operations")
+        metrics.inc(f"db.commands.{event.command_name}")
+        metrics.observe("db.operation_ms", duration_ms)
+        if failed:
+            metrics.inc("db.failures")
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.record(event.command_name, duration_ms)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+def _optional_int(name: str):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+def client_options() -> dict:
+    """Connection pool, timeout and compression settings for the shared client, read from the environment."""
+    options = {
+        "appname": os.getenv("MONGODB_APP_NAME", "math-edu-backend"),
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+    }
+    optional = {
+        "socketTimeoutMS": _optional_int("MONGODB_SOCKET_TIMEOUT_MS"),
+        "waitQueueTimeoutMS": _optional_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS"),
+        "maxConnecting": _optional_int("MONGODB_MAX_CONNECTING"),
+        "zlibCompressionLevel": _optional_int("MONGODB_ZLIB_COMPRESSION_LEVEL"),
+    }
+    options.update({key: value for key, value in optional.items() if value is not None})
+    # Comma-separated, in order of preference, e.g. "zstd,snappy,zlib"
+    compressors = os.getenv("MONGODB_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def connect() -> AsyncIOMotorClient:
+    """Open the process-wide Motor client. Called from the FastAPI lifespan; safe to call twice."""
+    global _client
+    if _client is None:
+        options = client_options()
+        _client = AsyncIOMotorClient(MONGODB_URI, event_listeners=[_CommandAccounting()], **options)
+        logger.info(f"MongoDB client opened for database '{MONGODB_DB_NAME}' with options: {options}")
+    return _client
+
+def close():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("MongoDB client closed")
+
+def get_client() -> AsyncIOMotorClient:
+    if _client is None:
+        raise RuntimeError("MongoDB client is not open; call database.connect() first")
+    return _client
+
+def get_database():
+    return get_client()[MONGODB_DB_NAME]
+
+class _DatabaseProxy:
+    """
+    Module-level stand-in for the application database. Routers import `db` at import
+    time and use it as before (`db.users.find_one(...)`); every attribute access is
+    resolved against the shared client opened by connect().
+    """
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+db = _DatabaseProxy()
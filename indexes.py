@@ -0,0 +1,166 @@
+# indexes.py
+"""
+Declarative registry of the MongoDB indexes the routers rely on, plus the query shapes
+they issue. Indexes are built at startup by ensure_indexes(); explain_queries() runs
+explain() on every registered query shape and flags the ones that fall back to a
+collection scan.
+
+CLI:
+    python indexes.py ensure     # create any missing index
+    python indexes.py explain    # report the winning plan of every registered query
+"""
+import asyncio
+import json
+import logging
+import sys
+from pymongo.errors import OperationFailure
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACTIVE_ONLY = {"isActive": True}
+
+# collection -> index specs; "keys" is a pymongo key list, every other entry is passed to create_index
+INDEXES = {
+    "users": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("email", 1)]},  # login
+        {"keys": [("disabled", 1), ("role", 1)]},  # user listing, with or without a role filter
+        {"keys": [("tutorId", 1), ("disabled", 1)]},  # users by tutor, tutor's students
+    ],
+    "questions": [
+        {"keys": [("id", 1)], "unique": True, "partialFilterExpression": {"id": {"$exists": True}}},
+        # Keyset pagination of active questions on (createdAt, id), alone and under each list filter
+        {"keys": [("isActive", 1), ("createdAt", 1), ("id", 1)], "partialFilterExpression": ACTIVE_ONLY},
+        {"keys": [("difficulty", 1), ("createdAt", 1), ("id", 1)], "partialFilterExpression": ACTIVE_ONLY},
+        {"keys": [("category", 1), ("createdAt", 1), ("id", 1)], "partialFilterExpression": ACTIVE_ONLY},
+        {"keys": [("knowledgePointIds", 1), ("createdAt", 1), ("id", 1)], "partialFilterExpression": ACTIVE_ONLY},
+        {"keys": [("passValidation", 1), ("createdAt", 1), ("id", 1)], "partialFilterExpression": ACTIVE_ONLY},
+    ],
+    "knowledge_points": [
+        {"keys": [("id", 1)]},
+        {
+            "keys": [("version", 1), ("grade", 1), ("strand", 1), ("topic", 1), ("skill", 1)],
+            "partialFilterExpression": ACTIVE_ONLY,
+        },
+    ],
+    "answers": [
+        {"keys": [("studentId", 1)]},
+    ],
+    "assignments": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("studentId", 1)]},
+    ],
+    "classrooms": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("name", 1)]},
+    ],
+    "courses": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("isActive", 1)], "partialFilterExpression": ACTIVE_ONLY},
+        {"keys": [("name", 1), ("grade", 1)]},
+    ],
+    "students": [
+        {"keys": [("id", 1)]},
+    ],
+    "question_pool": [
+        {"keys": [("difficulty", 1), ("topic", 1), ("provider", 1), ("createdAt", 1)]},  # pop oldest per key, depth counts
+    ],
+}
+
+# Representative query shapes issued by the routers, with placeholder values
+QUERY_SHAPES = [
+    {"name": "auth.get_user_by_id", "collection": "users", "filter": {"id": "u"}},
+    {"name": "auth.login", "collection": "users", "filter": {"email": "e"}},
+    {"name": "users.get_users", "collection": "users", "filter": {"role": "student", "disabled": False}},
+    {"name": "users.get_users.all_roles", "collection": "users", "filter": {"disabled": False}},
+    {"name": "users.get_users_by_tutor", "collection": "users", "filter": {"tutorId": "t", "disabled": False}},
+    {"name": "users.validate_user_ids", "collection": "users", "filter": {"id": "u", "role": "parent", "disabled": False}},
+    {"name": "assignments.tutor_students", "collection": "users", "filter": {"role": "student", "tutorId": "t"}},
+    {"name": "questions.get_questions", "collection": "questions", "filter": {"isActive": True}, "sort": [("createdAt", 1), ("id", 1)]},
+    {"name": "questions.get_questions.difficulty", "collection": "questions", "filter": {"isActive": True, "difficulty": "easy"}, "sort": [("createdAt", 1), ("id", 1)]},
+    {"name": "questions.get_questions.category", "collection": "questions", "filter": {"isActive": True, "category": "algebra"}, "sort": [("createdAt", 1), ("id", 1)]},
+    {"name": "questions.get_questions.knowledge_points", "collection": "questions", "filter": {"isActive": True, "knowledgePointIds": {"$in": ["k"]}}, "sort": [("createdAt", 1), ("id", 1)]},
+    {"name": "questions.get_questions.pass_validation", "collection": "questions", "filter": {"isActive": True, "passValidation": True}, "sort": [("createdAt", 1), ("id", 1)]},
+    {"name": "questions.get_question_by_id", "collection": "questions", "filter": {"id": "q", "isActive": True}},
+    {"name": "knowledge_points.by_ids", "collection": "knowledge_points", "filter": {"id": {"$in": ["k"]}, "isActive": True}},
+    {"name": "knowledge_points.get_knowledge_points", "collection": "knowledge_points", "filter": {"version": "2025.01", "isActive": True, "grade": "g"}},
+    {"name": "answers.get_answers", "collection": "answers", "filter": {"studentId": "s"}},
+    {"name": "assignments.get_assignments", "collection": "assignments", "filter": {"studentId": "s"}},
+    {"name": "assignments.submit_assignment", "collection": "assignments", "filter": {"id": "a"}},
+    {"name": "classrooms.by_id", "collection": "classrooms", "filter": {"id": "c"}},
+    {"name": "classrooms.by_name", "collection": "classrooms", "filter": {"name": "n"}},
+    {"name": "courses.get_courses", "collection": "courses", "filter": {"isActive": True}},
+    {"name": "courses.by_name_grade", "collection": "courses", "filter": {"name": "n", "grade": "g"}},
+    {"name": "students.by_id", "collection": "students", "filter": {"id": "s"}},
+    {"name": "question_pool.pop", "collection": "question_pool", "filter": {"difficulty": "easy", "topic": None, "provider": "grok"}, "sort": [("createdAt", 1)]},
+]
+
+async def ensure_indexes(db) -> list:
+    """Create every registered index; existing ones are left alone. Returns the index names."""
+    names = []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != "keys"}
+            try:
+                names.append(await db[collection].create_index(spec["keys"], **options))
+            except OperationFailure as e:
+                # e.g. an index with the same keys but different options already exists
+                logger.error(f"Could not create index {spec['keys']} on {collection}: {str(e)}")
+    logger.info(f"Ensured {len(names)} indexes")
+    return names
+
+def _plan_stages(plan: dict, stages: list, index_names: list):
+    stage = plan.get("stage")
+    if stage:
+        stages.append(stage)
+    if plan.get("indexName"):
+        index_names.append(plan["indexName"])
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            _plan_stages(plan[key], stages, index_names)
+    for child in plan.get("inputStages", []):
+        _plan_stages(child, stages, index_names)
+
+async def explain_queries(db, shapes: list = None) -> list:
+    """Run explain() on each registered query shape and flag collection scans."""
+    report = []
+    for shape in shapes or QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explanation = await cursor.explain()
+        stages, index_names = [], []
+        _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}), stages, index_names)
+        collection_scan = "COLLSCAN" in stages
+        if collection_scan:
+            logger.warning(f"Query {shape['name']} on {shape['collection']} uses a collection scan")
+        report.append({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "filter": str(shape["filter"]),
+            "stages": stages,
+            "indexes": index_names,
+            "collectionScan": collection_scan,
+        })
+    return report
+
+async def _main(command: str) -> int:
+    import database
+    database.connect()
+    try:
+        if command == "ensure":
+            print(json.dumps(await ensure_indexes(database.db), indent=2))
+            return 0
+        report = await explain_queries(database.db)
+        print(json.dumps(report, indent=2))
+        return 1 if any(entry["collectionScan"] for entry in report) else 0
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("ensure", "explain"):
+        print("Usage: python indexes.py ensure|explain")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
@@ -0,0 +1,118 @@
+# llm_clients.py
+"""
+One long-lived httpx.AsyncClient per LLM provider, opened and closed by the app lifespan
+like the Motor client in database.py. Reusing the client keeps connections alive between
+requests, so only the first request to a provider pays the TCP + TLS handshake.
+"""
+import os
+import time
+import httpx
+from dotenv import load_dotenv
+from metrics import metrics
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+
+# Base URL per provider; settings below can be overridden per provider with its prefix,
+# e.g. XAI_HTTP_READ_TIMEOUT overrides LLM_HTTP_READ_TIMEOUT for xAI only
+PROVIDERS = {
+    "xai": {"base_url": os.getenv("XAI_BASE_URL", "https://api.x.ai"), "prefix": "XAI"},
+    "mistral": {"base_url": os.getenv("AI_SERVER_URL", "http://localhost:8080"), "prefix": "MISTRAL"},
+    "openai": {"base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com"), "prefix": "OPENAI"},
+}
+
+_clients = {}
+
+def _setting(provider: str, name: str, default: str) -> str:
+    prefix = PROVIDERS[provider]["prefix"]
+    return os.getenv(f"{prefix}_HTTP_{name}", os.getenv(f"LLM_HTTP_{name}", default))
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx only speaks HTTP/2 when the h2 package is installed)
+        return True
+    except ImportError:
+        return False
+
+def client_options(provider: str) -> dict:
+    """Pool limits, timeouts and protocol for a provider's client, read from the environment."""
+    prefix = PROVIDERS[provider]["prefix"]
+    http2 = os.getenv(f"{prefix}_HTTP2", os.getenv("LLM_HTTP2", "true")).lower() in ("1", "true", "yes")
+    if http2 and not _http2_available():
+        logger.info(f"HTTP/2 requested for {provider} but the h2 package is not installed; using HTTP/1.1 keep-alive")
+        http2 = False
+    return {
+        "base_url": PROVIDERS[provider]["base_url"],
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=int(_setting(provider, "MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(_setting(provider, "MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(_setting(provider, "KEEPALIVE_EXPIRY", "60")),
+        ),
+        "timeout": httpx.Timeout(
+            float(_setting(provider, "READ_TIMEOUT", "30")),
+            connect=float(_setting(provider, "CONNECT_TIMEOUT", "10")),
+            pool=float(_setting(provider, "POOL_TIMEOUT", "10")),
+        ),
+    }
+
+def _event_hooks(provider: str) -> dict:
+    """Per-provider request counts, latency to response headers, and new connections with their setup time."""
+    async def on_request(request: httpx.Request):
+        started = {}
+
+        async def trace(event_name: str, info: dict):
+            # httpcore reports connection setup; these events only fire for new connections
+            if event_name in ("connection.connect_tcp.started", "connection.start_tls.started"):
+                started[event_name] = time.perf_counter()
+            elif event_name == "connection.connect_tcp.complete":
+                metrics.inc(f"llm.{provider}.connections_opened")
+                metrics.observe(f"llm.{provider}.connect_ms", (time.perf_counter() - started.pop("connection.connect_tcp.started")) * 1000)
+            elif event_name == "connection.start_tls.complete":
+                metrics.observe(f"llm.{provider}.tls_handshake_ms", (time.perf_counter() - started.pop("connection.start_tls.started")) * 1000)
+
+        request.extensions["trace"] = trace
+        request.extensions["llm_started"] = time.perf_counter()
+        metrics.inc(f"llm.{provider}.requests")
+
+    async def on_response(response: httpx.Response):
+        # Fires once the headers arrive, i.e. time to first byte for streamed completions
+        metrics.observe(f"llm.{provider}.response_ms", (time.perf_counter() - response.request.extensions["llm_started"]) * 1000)
+        if response.status_code >= 400:
+            metrics.inc(f"llm.{provider}.errors")
+
+    return {"request": [on_request], "response": [on_response]}
+
+def connect():
+    """Open every provider's client. Called from the FastAPI lifespan; safe to call twice."""
+    for provider in PROVIDERS:
+        get_client(provider)
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """The shared client for `provider`; opened on first use outside the app (scripts)."""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        options = client_options(provider)
+        client = httpx.AsyncClient(event_hooks=_event_hooks(provider), **options)
+        _clients[provider] = client
+        logger.info(f"HTTP client for {provider} opened: {options['base_url']} (HTTP/2: {options['http2']}, {options['limits']}, {options['timeout']})")
+    return client
+
+async def close():
+    for provider, client in list(_clients.items()):
+        await client.aclose()
+        logger.info(f"HTTP client for {provider} closed")
+    _clients.clear()
+
+def stats() -> dict:
+    return {
+        provider: {"baseUrl": str(client.base_url), "closed": client.is_closed}
+        for provider, client in _clients.items()
+    }
+
+metrics.gauge("llm.clients", stats)
@@ -1,25 +1,64 @@
 # main.py
 import sys
 import os
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routes import verify_answer, question_generator, ai_mistral,ai_grok, questions, assignments, answers, auth, users, classrooms, performance, managers, knowledge_points, courses, tutors, students
+from routes import verify_answer, question_generator, ai_mistral,ai_grok, questions, assignments, answers, auth, users, classrooms, performance, managers, knowledge_points, courses, tutors, students, admin
+from routes.password_hashing import password_hasher
+from routes.verify_answer import answer_verifier, VERIFY_ANSWER_WARMUP
+from routes.knowledge_point_catalog import knowledge_point_catalog
+from routes.question_pool import question_pool, QUESTION_POOL_ENABLED
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
+import database
+import llm_clients
+from database import db
+from indexes import ensure_indexes
+from metrics import metrics
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv()
 
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 async def init_db():
-    await db.users.create_index("id", unique=True)
-    await db.assignments.create_index("id", unique=True)
-    await db.classrooms.create_index("id", unique=True)
-    await db.courses.create_index("id", unique=True)
+    # Indexes for every router query shape are declared in indexes.py
+    await ensure_indexes(db)
 
-app = FastAPI()
+async def _warm_up_verifier():
+    try:
+        await answer_verifier.warm_up()
+    except Exception as e:
+        logger.error(f"Answer verification warm-up failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Motor client (and connection pool) per process, shared by every router
+    database.connect()
+    # Likewise one keep-alive HTTP client per LLM provider
+    llm_clients.connect()
+    await init_db()
+    await knowledge_point_catalog.reload()
+    catalog_refresher = asyncio.create_task(knowledge_point_catalog.run_refresher())
+    # SymPy is only imported by the verification workers; optionally start them once serving begins
+    verifier_warm_up = asyncio.create_task(_warm_up_verifier()) if VERIFY_ANSWER_WARMUP else None
+    # Keeps pre-generated questions ready so /api/generate-question/ rarely waits on an LLM
+    pool_refiller = asyncio.create_task(question_pool.run_refiller(question_generator.generate_pool_question)) if QUESTION_POOL_ENABLED else None
+    yield
+    catalog_refresher.cancel()
+    if verifier_warm_up:
+        verifier_warm_up.cancel()
+    if pool_refiller:
+        pool_refiller.cancel()
+    password_hasher.shutdown()
+    answer_verifier.shutdown()
+    await llm_clients.close()
+    database.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,8 +66,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Operations", "X-DB-Time-Ms", "X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def db_round_trip_accounting(request: Request, call_next):
+    stats, token = database.start_request_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        database.reset_request_stats(token)
+    response.headers["X-DB-Operations"] = str(stats.operations)
+    response.headers["X-DB-Time-Ms"] = f"{stats.duration_ms:.1f}"
+    metrics.observe("http.db_operations_per_request", stats.operations)
+    metrics.observe("http.db_ms_per_request", stats.duration_ms)
+    if stats.operations > database.DB_ROUND_TRIP_BUDGET:
+        metrics.inc("http.db_budget_exceeded")
+        logger.warning(
+            f"{request.method} {request.url.path} made {stats.operations} database round trips "
+            f"(budget {database.DB_ROUND_TRIP_BUDGET}, {stats.duration_ms:.1f} ms): {stats.commands}"
+        )
+    return response
+
 app.include_router(questions.router)
 app.include_router(users.router)
 app.include_router(assignments.router)
@@ -46,13 +105,9 @@ app.include_router(users.router)
 app.include_router(students.router)
 app.include_router(verify_answer.router)
 app.include_router(question_generator.router)
+app.include_router(admin.router)
 
 
-
-@app.on_event("startup")
-async def startup_event():
-    await init_db()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,46 @@
+# metrics.py
+"""
+Process-local metrics registry: counters, timing summaries and gauges.
+Read by admins via GET /api/admin/metrics.
+"""
+import threading
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self._gauges = {}
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """Record one observation (a duration, a size, a count per request) in a count/sum/max summary."""
+        with self._lock:
+            summary = self._summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def gauge(self, name: str, fn):
+        """Register a callable that returns the current value (a number or a dict) at snapshot time."""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {
+                name: {**summary, "avg": summary["sum"] / summary["count"] if summary["count"] else 0.0}
+                for name, summary in self._summaries.items()
+            }
+            gauges = dict(self._gauges)
+        return {
+            "counters": counters,
+            "summaries": summaries,
+            "gauges": {name: fn() for name, fn in gauges.items()},
+        }
+
+metrics = MetricsRegistry()
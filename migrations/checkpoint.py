@@ -0,0 +1,10 @@
+# migrations/checkpoint.py
+"""Progress records for resumable migrations, one document per migration in the `migrations` collection."""
+from datetime import datetime
+
+async def load_checkpoint(db, migration_id: str) -> dict:
+    return await db.migrations.find_one({"_id": migration_id}) or {"_id": migration_id, "converted": 0}
+
+async def save_checkpoint(db, checkpoint: dict):
+    checkpoint["updatedAt"] = datetime.utcnow().isoformat()
+    await db.migrations.replace_one({"_id": checkpoint["_id"]}, checkpoint, upsert=True)
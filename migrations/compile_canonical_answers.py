@@ -0,0 +1,87 @@
+# migrations/compile_canonical_answers.py
+"""
+Stores the canonical form of every question's correct answer (see
+routes/answer_verification.compile_correct_answers) so /api/verify-answer/by-question only
+has to parse the student's side. Questions without a canonicalAnswer, or with one from an
+older CANONICAL_VERSION, are compiled in _id-ordered batches; progress is checkpointed in
+the `migrations` collection. An interrupted run resumes where it stopped, while a finished
+run or a CANONICAL_VERSION bump makes the next run start from the beginning.
+
+CLI:
+    python -m migrations.compile_canonical_answers [--batch-size 200] [--timeout 2] [--restart]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+from migrations.checkpoint import load_checkpoint, save_checkpoint
+from routes.answer_verification import CANONICAL_VERSION, compile_correct_answers, correct_answer_pairs
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "compile_canonical_answers"
+STALE_FILTER = {"canonicalAnswer.version": {"$ne": CANONICAL_VERSION}}
+
+async def compile_canonical_answers(db, batch_size: int = 200, timeout: float = 2.0, restart: bool = False) -> dict:
+    """Compile every stale canonical answer; returns the final checkpoint."""
+    from routes.questions import normalize_legacy_fields
+
+    checkpoint = {"_id": MIGRATION_ID, "converted": 0} if restart else await load_checkpoint(db, MIGRATION_ID)
+    checkpoint.pop("completedAt", None)
+    if checkpoint.get("version") != CANONICAL_VERSION:
+        # Questions already passed were compiled for an older version; walk the collection again
+        checkpoint.pop("lastId", None)
+    checkpoint["version"] = CANONICAL_VERSION
+    query = dict(STALE_FILTER)
+    if checkpoint.get("lastId") is not None:
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+    remaining = await db.questions.count_documents(query)
+    logger.info(f"{remaining} questions need a canonical answer (already compiled: {checkpoint['converted']})")
+
+    done = 0
+    while True:
+        batch = await db.questions.find(query, {"correctAnswer": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        updates = []
+        for question in batch:
+            correct_answer = question.get("correctAnswer") or []
+            if isinstance(correct_answer, str):
+                correct_answer = normalize_legacy_fields({"correctAnswer": correct_answer})["correctAnswer"]
+            canonical = compile_correct_answers(correct_answer_pairs(correct_answer), timeout)
+            updates.append(UpdateOne({"_id": question["_id"]}, {"$set": {"canonicalAnswer": canonical}}))
+        result = await db.questions.bulk_write(updates, ordered=False)
+        checkpoint["converted"] += result.modified_count
+        done += len(batch)
+        checkpoint["lastId"] = batch[-1]["_id"]
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+        await save_checkpoint(db, checkpoint)
+        logger.info(f"Compiled canonical answers for {done}/{remaining} questions")
+
+    # Only an interrupted run resumes; the next one starts from the first question again
+    checkpoint.pop("lastId", None)
+    checkpoint["completedAt"] = datetime.utcnow().isoformat()
+    await save_checkpoint(db, checkpoint)
+    return checkpoint
+
+async def _main(args) -> int:
+    import database
+    database.connect()
+    try:
+        checkpoint = await compile_canonical_answers(database.db, args.batch_size, args.timeout, args.restart)
+        print(json.dumps(checkpoint, indent=2, default=str))
+        return 0
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store the canonical form of every question's correct answer")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds allowed per expression")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
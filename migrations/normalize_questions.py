@@ -0,0 +1,84 @@
+# migrations/normalize_questions.py
+"""
+One-off conversion of questions still stored in the legacy string form (`question` as
+marked-up text, `correctAnswer` as a comma-separated string) to segment arrays, so the
+read path never has to parse them.
+
+The collection is walked in _id order in batches; the last converted _id is checkpointed
+in the `migrations` collection after every batch, so an interrupted run resumes where it
+stopped. A completed run clears it, so the next run checks the whole collection again.
+
+CLI:
+    python -m migrations.normalize_questions [--batch-size 500] [--dry-run] [--restart]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+from migrations.checkpoint import load_checkpoint, save_checkpoint
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "normalize_questions"
+LEGACY_FILTER = {"$or": [{"question": {"$type": "string"}}, {"correctAnswer": {"$type": "string"}}]}
+
+async def normalize_questions(db, batch_size: int = 500, dry_run: bool = False, restart: bool = False) -> dict:
+    """Convert every legacy question; returns the final checkpoint."""
+    from routes.questions import normalize_legacy_fields
+
+    checkpoint = {"_id": MIGRATION_ID, "converted": 0} if restart else await load_checkpoint(db, MIGRATION_ID)
+    checkpoint.pop("completedAt", None)
+    query = dict(LEGACY_FILTER)
+    if checkpoint.get("lastId") is not None:
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+    remaining = await db.questions.count_documents(query)
+    logger.info(f"{remaining} legacy questions to normalize (already converted: {checkpoint['converted']})")
+
+    done = 0
+    while True:
+        batch = await db.questions.find(query, {"question": 1, "correctAnswer": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        updates = []
+        for question in batch:
+            fields = normalize_legacy_fields(question)
+            guard = {field: {"$type": "string"} for field in fields}
+            updates.append(UpdateOne({"_id": question["_id"], **guard}, {"$set": fields}))
+        if not dry_run:
+            result = await db.questions.bulk_write(updates, ordered=False)
+            checkpoint["converted"] += result.modified_count
+        done += len(batch)
+        checkpoint["lastId"] = batch[-1]["_id"]
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+        if not dry_run:
+            await save_checkpoint(db, checkpoint)
+        logger.info(f"Normalized {done}/{remaining} legacy questions")
+
+    # Only an interrupted run resumes; the next one starts from the first question again
+    checkpoint.pop("lastId", None)
+    checkpoint["completedAt"] = datetime.utcnow().isoformat()
+    if not dry_run:
+        await save_checkpoint(db, checkpoint)
+    return checkpoint
+
+async def _main(args) -> int:
+    import database
+    database.connect()
+    try:
+        checkpoint = await normalize_questions(database.db, args.batch_size, args.dry_run, args.restart)
+        print(json.dumps(checkpoint, indent=2, default=str))
+        return 0
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert legacy string-form questions to segment arrays")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="parse and report without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,24 @@
+# routes/admin.py
+from fastapi import APIRouter, HTTPException, Depends
+from database import db
+from indexes import explain_queries
+from metrics import metrics
+from .auth import get_current_user
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+@router.get("/index-report")
+async def get_index_report(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view the index report")
+    report = await explain_queries(db)
+    return {
+        "collectionScans": [entry["name"] for entry in report if entry["collectionScan"]],
+        "queries": report
+    }
+
+@router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view metrics")
+    return metrics.snapshot()
@@ -2,10 +2,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import httpx
+import llm_clients
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 import logging
 import traceback
 
@@ -14,8 +15,6 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
@@ -25,15 +24,14 @@ class PromptRequest(BaseModel):
 @router.post("/mistral")
 async def evaluate_answer(request: PromptRequest):
     logger.info(f"Forwarding prompt to AI server: {request.prompt}")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{os.getenv('AI_SERVER_URL', 'http://localhost:8080')}/v1/chat/completions",
-            json={"prompt": request.prompt},
-            timeout=30
-        )
-        response.raise_for_status()
-        logger.info(f"AI server response: {response.json()}")
-        return response.json()
+    client = llm_clients.get_client("mistral")
+    response = await client.post(
+        llm_clients.CHAT_COMPLETIONS_PATH,
+        json={"prompt": request.prompt}
+    )
+    response.raise_for_status()
+    logger.info(f"AI server response: {response.json()}")
+    return response.json()
     
 
 
@@ -41,39 +39,39 @@ async def evaluate_answer(request: PromptRequest):
 async def call_grok(request: PromptRequest):
     try:
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                json={
-                    "model": "grok-3-latest",
-                    "messages": [{"role": "user", "content": request.prompt}],
-                    "stream": False,
-                    "temperature": 0.7,
-                    "max_tokens": 100
-                },
-                headers={"Authorization": f"Bearer {os.getenv('XAI_API_KEY')}"}
-            )
-            response.raise_for_status()
-            logger.info(f"Grok API response: {response.json()}")
-
-
-            response_data = response.json()
-            if "choices" not in response_data or not response_data["choices"]:
-                logger.error("Grok API response missing 'choices' field")
-                raise ValueError("Grok API response missing 'choices' field")
-            
-            choice = response_data["choices"][0]
-            if "message" in choice and "content" in choice["message"]:
-                answer = choice["message"]["content"]
-            elif "text" in choice:
-                answer = choice["text"]
-            elif "content" in choice:
-                answer = choice["content"]
-            else:
-                logger.error("Grok API response missing expected content field")
-                raise ValueError("Grok API response missing expected content field")
-
-            return {"answer": answer}
+        client = llm_clients.get_client("xai")
+        response = await client.post(
+            llm_clients.CHAT_COMPLETIONS_PATH,
+            json={
+                "model": "grok-3-latest",
+                "messages": [{"role": "user", "content": request.prompt}],
+                "stream": False,
+                "temperature": 0.7,
+                "max_tokens": 100
+            },
+            headers={"Authorization": f"Bearer {os.getenv('XAI_API_KEY')}"}
+        )
+        response.raise_for_status()
+        logger.info(f"Grok API response: {response.json()}")
+
+
+        response_data = response.json()
+        if "choices" not in response_data or not response_data["choices"]:
+            logger.error("Grok API response missing 'choices' field")
+            raise ValueError("Grok API response missing 'choices' field")
+        
+        choice = response_data["choices"][0]
+        if "message" in choice and "content" in choice["message"]:
+            answer = choice["message"]["content"]
+        elif "text" in choice:
+            answer = choice["text"]
+        elif "content" in choice:
+            answer = choice["content"]
+        else:
+            logger.error("Grok API response missing expected content field")
+            raise ValueError("Grok API response missing expected content field")
+
+        return {"answer": answer}
     except httpx.HTTPStatusError as e:
         error_detail = e.response.json() if e.response.content else str(e)
         logger.error(f"Grok API HTTP error: {error_detail}")
@@ -100,34 +98,34 @@ async def analyze_student(student_data: dict, target_audience: str = "student",
     student_data["prompt"] = prompt
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:  # Add timeout
-            print(f"Sending request to Grok API with student data: {student_data}")
-            response = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                json={
-                    "model": "grok-3-latest",
-                    "messages": [
-                        {"role": "user", "content": f"{prompt}\n\nStudent Data: {student_data}"}
-                    ],
-                    "stream": False,
-                    "temperature": 0.7,
-                },
-                headers={"Authorization": f"Bearer {os.getenv('XAI_API_KEY')}"}
-            )
-
-
-
-            response.raise_for_status()
-            analysis = response.json()["choices"][0]["message"]["content"]
-            print(f"Grok response: {analysis}")
-            await db.student_analyses.insert_one({
-                "studentId": student_data["studentId"],
-                "targetAudience": target_audience,
-                "language": language,
-                "analysis": analysis,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            return {"analysis": analysis}
+        client = llm_clients.get_client("xai")
+        print(f"Sending request to Grok API with student data: {student_data}")
+        response = await client.post(
+            llm_clients.CHAT_COMPLETIONS_PATH,
+            json={
+                "model": "grok-3-latest",
+                "messages": [
+                    {"role": "user", "content": f"{prompt}\n\nStudent Data: {student_data}"}
+                ],
+                "stream": False,
+                "temperature": 0.7,
+            },
+            headers={"Authorization": f"Bearer {os.getenv('XAI_API_KEY')}"}
+        )
+
+
+
+        response.raise_for_status()
+        analysis = response.json()["choices"][0]["message"]["content"]
+        print(f"Grok response: {analysis}")
+        await db.student_analyses.insert_one({
+            "studentId": student_data["studentId"],
+            "targetAudience": target_audience,
+            "language": language,
+            "analysis": analysis,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        return {"analysis": analysis}
     except httpx.HTTPStatusError as e:
         print(f"Grok API error: {e}")
         print(f"Response status: {e.response.status_code}, Response text: {e.response.text}")
@@ -2,10 +2,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import httpx
+import llm_clients
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 import logging
 import traceback
 
@@ -14,8 +15,6 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 
 router = APIRouter(prefix="/api/ai_mistral", tags=["ai_mistral"])
 
@@ -25,15 +24,14 @@ class PromptRequest(BaseModel):
 @router.post("/mistral_evaluate")
 async def evaluate_answer(request: PromptRequest):
     logger.info(f"Forwarding prompt to AI server: {request.prompt}")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{os.getenv('AI_SERVER_URL', 'http://localhost:8080')}/v1/chat/completions",
-            json={"prompt": request.prompt},
-            timeout=30
-        )
-        response.raise_for_status()
-        logger.info(f"AI server response: {response.json()}")
-        return response.json()
+    client = llm_clients.get_client("mistral")
+    response = await client.post(
+        llm_clients.CHAT_COMPLETIONS_PATH,
+        json={"prompt": request.prompt}
+    )
+    response.raise_for_status()
+    logger.info(f"AI server response: {response.json()}")
+    return response.json()
     
 
 
@@ -41,11 +39,10 @@ async def evaluate_answer(request: PromptRequest):
 async def call_mistral(request: PromptRequest):
     try:
         logger.info(f"Forwarding prompt to AI server: {request.prompt}")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-            f"{os.getenv('AI_SERVER_URL', 'http://localhost:8080')}/v1/chat/completions",
-            json={"prompt": request.prompt},
-            timeout=30
+        client = llm_clients.get_client("mistral")
+        response = await client.post(
+            llm_clients.CHAT_COMPLETIONS_PATH,
+            json={"prompt": request.prompt}
         )
         response.raise_for_status()
         logger.info(f"AI server response: {response.json()}")
@@ -94,25 +91,24 @@ async def analyze_student(student_data: dict, target_audience: str = "student",
 
     try:
         logger.info(f"Forwarding prompt to AI server: {student_data}")
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{os.getenv('AI_SERVER_URL', 'http://localhost:8080')}/v1/chat/completions",
-                json={"prompt": f"{prompt}\n\nStudent Data: {student_data}"},
-                timeout=30
-            )
-            logger.info(f"AI server response: {response.json()}")
+        client = llm_clients.get_client("mistral")
+        response = await client.post(
+            llm_clients.CHAT_COMPLETIONS_PATH,
+            json={"prompt": f"{prompt}\n\nStudent Data: {student_data}"}
+        )
+        logger.info(f"AI server response: {response.json()}")
 
-            response.raise_for_status()
-            analysis = response.json()["choices"][0]["message"]["content"]
-            print(f"Grok response: {analysis}")
-            await db.student_analyses.insert_one({
-                "studentId": student_data["studentId"],
-                "targetAudience": target_audience,
-                "language": language,
-                "analysis": analysis,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            return {"analysis": analysis}
+        response.raise_for_status()
+        analysis = response.json()["choices"][0]["message"]["content"]
+        print(f"Grok response: {analysis}")
+        await db.student_analyses.insert_one({
+            "studentId": student_data["studentId"],
+            "targetAudience": target_audience,
+            "language": language,
+            "analysis": analysis,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        return {"analysis": analysis}
     except httpx.HTTPStatusError as e:
         print(f"Grok API error: {e}")
         print(f"Response status: {e.response.status_code}, Response text: {e.response.text}")
@@ -0,0 +1,311 @@
+# routes/answer_canonicalizer.py
+"""
+Structured answers: assignment lists ("x=3,y=1"), solution sets ("\\{1, 2\\}",
+"x \\in \\{1, 2\\}"), intervals ("(1, 3]", "[0, \\infty)") and ordered pairs/tuples
+("(3, 1)"). canonicalize() turns such a LaTeX or text answer into a normalized
+StructuredAnswer whose atoms are Fractions where the value is rational, so most
+comparisons are plain equality with no SymPy involved; other atoms are kept as normalized
+LaTeX for the caller to compare symbolically. Pure Python, so the API process can use it.
+"""
+import re
+from fractions import Fraction
+from typing import NamedTuple
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INFINITY = "oo"
+NEGATIVE_INFINITY = "-oo"
+
+class StructuredAnswer(NamedTuple):
+    """
+    kind is "assignments" (value: sorted ((variable, atom or frozenset of atoms), ...)),
+    "set" (frozenset of atoms), "interval" ((low, low_closed, high, high_closed)) or
+    "tuple" (tuple of atoms). Atoms are Fraction, INFINITY/NEGATIVE_INFINITY, or
+    whitespace-free LaTeX for anything else.
+    """
+    kind: str
+    value: tuple
+
+_MATH_DELIMITERS = (("$$", "$$"), ("$", "$"), ("\\(", "\\)"), ("\\[", "\\]"))
+# Spacing and sizing commands that never change the value
+_NOISE_RE = re.compile(r"\\(?:left|right|displaystyle)(?![a-zA-Z])|\\[,;:! ]|\\text\{\s*\}")
+_CONJUNCTION_RE = re.compile(r"\\text\{\s*(?:and|or)\s*\}|\\(?:q?quad|land|lor|wedge|vee)(?![a-zA-Z])|\s(?:and|or)\s")
+_VARIABLE_RE = re.compile(r"^[a-zA-Z](?:_\{?[a-zA-Z0-9]+\}?)?$")
+_NUMBER_RE = re.compile(r"^[+-]?(?:\d+(?:\.\d*)?|\.\d+)$")
+_SLASH_RE = re.compile(r"^([+-]?)(\d+)/(\d+)$")
+_FRAC_RE = re.compile(r"^([+-]?)\\[dt]?frac\{([+-]?\d+)\}\{([+-]?\d+)\}$")
+_INFINITY_RE = re.compile(r"^([+-]?)\\infty$")
+_IN_RE = re.compile(r"^([a-zA-Z](?:_\{?[a-zA-Z0-9]+\}?)?)\s*\\in(?![a-zA-Z])(.*)$")
+
+def _strip_delimiters(value: str) -> str:
+    value = value.strip()
+    for start, end in _MATH_DELIMITERS:
+        if len(value) >= len(start) + len(end) and value.startswith(start) and value.endswith(end):
+            return value[len(start):-len(end)].strip()
+    return value
+
+def _normalize(value: str) -> str:
+    value = _strip_delimiters(value)
+    value = _NOISE_RE.sub(" ", value)
+    value = value.replace("\\{", "\x01").replace("\\}", "\x02")  # set braces, distinct from grouping braces
+    return value.strip().rstrip(".").strip()
+
+def _split_top_level(value: str, separators: str = ",;"):
+    """Split on separators outside any bracket."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(value):
+        if char in "([{\x01":
+            depth += 1
+        elif char in ")]}\x02":
+            depth -= 1
+            if depth < 0:
+                # Half-open intervals like "[1, 3)" close with the "wrong" bracket
+                depth = 0
+        elif char in separators and depth == 0:
+            parts.append(value[start:i].strip())
+            start = i + 1
+    parts.append(value[start:].strip())
+    return parts
+
+def _wrapped(value: str, opening: str, closing: str) -> bool:
+    """True when value is one bracketed group, e.g. "(1, 2)" but not "(1)(2)"."""
+    if not (value.startswith(opening) and value.endswith(closing)) or len(value) < 2:
+        return False
+    depth = 0
+    for i, char in enumerate(value[:-1]):
+        if char in "([{\x01":
+            depth += 1
+        elif char in ")]}\x02":
+            depth -= 1
+        if depth == 0 and i > 0:
+            return False
+    return True
+
+def parse_atom(value: str):
+    """Fraction for rational literals, INFINITY/NEGATIVE_INFINITY, otherwise the LaTeX without whitespace."""
+    compact = "".join(value.split())
+    if not compact:
+        return None
+    if _NUMBER_RE.match(compact):
+        return Fraction(compact)
+    match = _SLASH_RE.match(compact) or _FRAC_RE.match(compact)
+    if match:
+        sign, numerator, denominator = match.groups()
+        if int(denominator) == 0:
+            return compact
+        number = Fraction(int(numerator), int(denominator))
+        return -number if sign == "-" else number
+    match = _INFINITY_RE.match(compact)
+    if match:
+        return NEGATIVE_INFINITY if match.group(1) == "-" else INFINITY
+    return compact
+
+def _atoms(parts: list):
+    atoms = [parse_atom(part) for part in parts]
+    return None if any(atom is None for atom in atoms) else atoms
+
+def _set(inner: str):
+    atoms = _atoms(_split_top_level(inner)) if inner.strip() else []
+    return None if atoms is None else StructuredAnswer("set", frozenset(atoms))
+
+def _bracketed(value: str):
+    """Set, interval or tuple for a single bracketed group; None otherwise."""
+    if _wrapped(value, "\x01", "\x02"):
+        return _set(value[1:-1])
+    if value[0] in "([" and value[-1] in ")]" and _wrapped(value, value[0], value[-1]):
+        atoms = _atoms(_split_top_level(value[1:-1]))
+        if not atoms or len(atoms) < 2:
+            return None
+        is_interval = len(atoms) == 2 and (value[0] == "[" or value[-1] == "]" or any(atom in (INFINITY, NEGATIVE_INFINITY) for atom in atoms))
+        if is_interval:
+            return StructuredAnswer("interval", (atoms[0], value[0] == "[", atoms[1], value[-1] == "]"))
+        if value[0] == "(" and value[-1] == ")":
+            return StructuredAnswer("tuple", tuple(atoms))
+    return None
+
+def _variable(value: str) -> str:
+    compact = "".join(value.split())
+    return compact.replace("{", "").replace("}", "") if _VARIABLE_RE.match(compact) else None
+
+def _assignments(parts: list):
+    values = {}
+    for part in parts:
+        sides = part.split("=")
+        if len(sides) != 2:
+            return None
+        left, right = sides
+        variable, atom = _variable(left), parse_atom(right)
+        if variable is not None and _variable(right) is not None:
+            # "a = b" names no value for either side, and "b = a" says the same
+            return None
+        if variable is None:
+            # "3 = x"
+            variable, atom = _variable(right), parse_atom(left)
+        if variable is None or atom is None:
+            return None
+        values.setdefault(variable, set()).add(atom)
+    if not values:
+        return None
+    # A variable given several values ("x=1 or x=2") is a solution set for that variable
+    return StructuredAnswer("assignments", tuple(sorted(
+        (variable, next(iter(atoms)) if len(atoms) == 1 else frozenset(atoms)) for variable, atoms in values.items()
+    )))
+
+def canonicalize(value: str):
+    """StructuredAnswer for a recognized structured answer, else None (compare it as a plain expression)."""
+    if not value or not isinstance(value, str):
+        return None
+    normalized = _normalize(value)
+    if not normalized:
+        return None
+    match = _IN_RE.match(normalized)
+    if match:
+        # "x \in \{1, 2\}" / "x \in [1, 3)": the membership is the answer
+        normalized = match.group(2).strip()
+    # "(x, y) = (3, 1)" is the assignment list x=3, y=1
+    sides = _split_top_level(normalized, "=")
+    if len(sides) == 2 and _wrapped(sides[0], "(", ")") and _wrapped(sides[1], "(", ")"):
+        variables, atoms = _split_top_level(sides[0][1:-1]), _split_top_level(sides[1][1:-1])
+        if len(variables) == len(atoms) > 1:
+            return _assignments([f"{variable}={atom}" for variable, atom in zip(variables, atoms)])
+    if normalized[0] in "([\x01":
+        return _bracketed(normalized)
+    if "=" in normalized:
+        parts = [part for part in _split_top_level(_CONJUNCTION_RE.sub(",", normalized)) if part]
+        return _assignments(parts)
+    return None
+
+def _atom_text(atom) -> str:
+    if isinstance(atom, Fraction):
+        return str(atom.numerator) if atom.denominator == 1 else f"{atom.numerator}/{atom.denominator}"
+    return atom
+
+def _sorted_atoms(atoms) -> list:
+    return sorted(atoms, key=lambda atom: (not isinstance(atom, Fraction), atom if isinstance(atom, Fraction) else 0, str(atom)))
+
+def describe(structured: StructuredAnswer) -> str:
+    """Readable canonical form, e.g. "x=3, y=1", "{1, 2}", "(1, 3]", "(3, 1)"."""
+    if structured.kind == "assignments":
+        return ", ".join(
+            f"{variable}={_atom_text(atom)}" if not isinstance(atom, frozenset)
+            else f"{variable}\u2208{{{', '.join(_atom_text(a) for a in _sorted_atoms(atom))}}}"
+            for variable, atom in structured.value
+        )
+    if structured.kind == "set":
+        return "{" + ", ".join(_atom_text(atom) for atom in _sorted_atoms(structured.value)) + "}"
+    if structured.kind == "interval":
+        low, low_closed, high, high_closed = structured.value
+        return f"{'[' if low_closed else '('}{_atom_text(low)}, {_atom_text(high)}{']' if high_closed else ')'}"
+    return "(" + ", ".join(_atom_text(atom) for atom in structured.value) + ")"
+
+def _atom_to_json(atom):
+    if isinstance(atom, Fraction):
+        return [atom.numerator, atom.denominator]
+    if isinstance(atom, frozenset):
+        return {"anyOf": [_atom_to_json(a) for a in _sorted_atoms(atom)]}
+    return atom
+
+def _atom_from_json(atom):
+    if isinstance(atom, list):
+        return Fraction(atom[0], atom[1])
+    if isinstance(atom, dict):
+        return frozenset(_atom_from_json(a) for a in atom["anyOf"])
+    return atom
+
+def to_json(structured: StructuredAnswer) -> dict:
+    """JSON/BSON-safe form for storing with a question; rationals become [numerator, denominator]."""
+    if structured.kind == "assignments":
+        value = {variable: _atom_to_json(atom) for variable, atom in structured.value}
+    elif structured.kind == "set":
+        value = [_atom_to_json(atom) for atom in _sorted_atoms(structured.value)]
+    elif structured.kind == "interval":
+        low, low_closed, high, high_closed = structured.value
+        value = {"low": _atom_to_json(low), "lowClosed": low_closed, "high": _atom_to_json(high), "highClosed": high_closed}
+    else:
+        value = [_atom_to_json(atom) for atom in structured.value]
+    return {"kind": structured.kind, "value": value, "text": describe(structured)}
+
+def from_json(data: dict) -> StructuredAnswer:
+    kind, value = data["kind"], data["value"]
+    if kind == "assignments":
+        return StructuredAnswer(kind, tuple(sorted((variable, _atom_from_json(atom)) for variable, atom in value.items())))
+    if kind == "set":
+        return StructuredAnswer(kind, frozenset(_atom_from_json(atom) for atom in value))
+    if kind == "interval":
+        return StructuredAnswer(kind, (_atom_from_json(value["low"]), value["lowClosed"], _atom_from_json(value["high"]), value["highClosed"]))
+    return StructuredAnswer(kind, tuple(_atom_from_json(atom) for atom in value))
+
+def _atoms_match(left, right, atom_equal) -> bool:
+    if isinstance(left, frozenset) or isinstance(right, frozenset):
+        left = left if isinstance(left, frozenset) else frozenset([left])
+        right = right if isinstance(right, frozenset) else frozenset([right])
+        return _sets_match(left, right, atom_equal)
+    if left == right:
+        return True
+    if isinstance(left, Fraction) and isinstance(right, Fraction):
+        return False
+    if left in (INFINITY, NEGATIVE_INFINITY) or right in (INFINITY, NEGATIVE_INFINITY):
+        return False
+    # At least one side is not a rational literal, e.g. \sqrt{2}
+    return bool(atom_equal and atom_equal(left, right))
+
+def _sets_match(left: frozenset, right: frozenset, atom_equal) -> bool:
+    if left == right:
+        return True
+    if len(left) != len(right):
+        return False
+    # Exact matches first; only the leftovers need the (symbolic) atom comparison
+    left_rest, right_rest = list(left - right), list(right - left)
+    for atom in left_rest:
+        match = next((i for i, other in enumerate(right_rest) if _atoms_match(atom, other, atom_equal)), None)
+        if match is None:
+            return False
+        right_rest.pop(match)
+    return True
+
+def _solution_set(structured: StructuredAnswer):
+    if structured.kind == "set":
+        return structured
+    if structured.kind == "assignments" and len(structured.value) == 1:
+        atom = structured.value[0][1]
+        return StructuredAnswer("set", atom if isinstance(atom, frozenset) else frozenset([atom]))
+    return None
+
+def compare_structured(test: StructuredAnswer, correct: StructuredAnswer, atom_equal=None):
+    """
+    True/False when both answers have the same kind, None when the kinds or assigned variables
+    differ (the caller should fall back to an expression comparison). atom_equal(a, b) is only consulted for
+    atoms that are not rational literals.
+    """
+    if test.kind != correct.kind:
+        # "x=1 or x=-2" against "\{1, -2\}": a single variable's solutions are a solution set
+        test, correct = _solution_set(test), _solution_set(correct)
+        if test is None or correct is None or test.kind != correct.kind:
+            return None
+    if test.kind == "assignments":
+        test_values, correct_values = dict(test.value), dict(correct.value)
+        if test_values.keys() != correct_values.keys():
+            # Different variables may still be the same equation; leave it to the expression comparison
+            return None
+        return all(_atoms_match(test_values[variable], correct_values[variable], atom_equal) for variable in correct_values)
+    if test.kind == "set":
+        return _sets_match(test.value, correct.value, atom_equal)
+    if test.kind == "interval":
+        return (test.value[1] == correct.value[1] and test.value[3] == correct.value[3]
+                and _atoms_match(test.value[0], correct.value[0], atom_equal)
+                and _atoms_match(test.value[2], correct.value[2], atom_equal))
+    return len(test.value) == len(correct.value) and all(
+        _atoms_match(left, right, atom_equal) for left, right in zip(test.value, correct.value)
+    )
+
+def annotate_segments(segments: list) -> list:
+    """Add a `structured` form (to_json) to answer segments that canonicalize; for generator output."""
+    for segment in segments:
+        if segment.get("type") in ("latex", "text"):
+            structured = canonicalize(segment.get("value", ""))
+            if structured is not None:
+                segment["structured"] = to_json(structured)
+    return segments
@@ -0,0 +1,606 @@
+# routes/answer_verification.py
+"""
+SymPy answer checking used by POST /api/verify-answer. Kept free of FastAPI and the
+database so it can be imported cheaply by the verification worker processes. SymPy, its
+ANTLR LaTeX parser and NumPy are imported inside the functions that use them: the API
+process imports this module only to hand the entry points to the pool, and should not pay
+for them at startup.
+"""
+import hashlib
+import os
+import signal
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from fractions import Fraction
+from functools import lru_cache
+from dotenv import load_dotenv
+from .answer_canonicalizer import canonicalize, compare_structured, describe, from_json, to_json
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Per worker process: parsed answers kept, and a cap on their approximate size in bytes
+VERIFY_ANSWER_CACHE_SIZE = int(os.getenv("VERIFY_ANSWER_CACHE_SIZE", "2048"))
+VERIFY_ANSWER_CACHE_MAX_BYTES = int(os.getenv("VERIFY_ANSWER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Compare numeric fingerprints before falling back to simplify/equals
+VERIFY_ANSWER_FAST_PATH = os.getenv("VERIFY_ANSWER_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Bump when the stored canonical answer format or parsing rules change; older forms are recompiled
+CANONICAL_VERSION = 3
+
+FINGERPRINT_SAMPLES = 16
+# A sample point agrees when its error is within both the relative and the absolute bound
+# (the absolute one is the symbolic check's 10-decimal rounding, so two different integers
+# never agree however large they are), and clearly differs above the relative bound
+FINGERPRINT_AGREE = 1e-9
+FINGERPRINT_AGREE_ABS = 1e-10
+FINGERPRINT_DIFFER = 1e-6
+
+class VerificationError(Exception):
+    """The request cannot be verified as given; reported to the client as a 400 with this message."""
+
+class ExpressionTimeout(BaseException):
+    """
+    One parse, simplify or comparison ran past the per-expression time limit. A BaseException
+    so that the broad `except Exception` handlers inside SymPy (and in fingerprint()) cannot
+    swallow it and carry on, or cache a result computed under an expired limit.
+    """
+
+@contextmanager
+def time_limit(seconds: float):
+    """Raise ExpressionTimeout if the block runs longer than `seconds`. SIGALRM is only
+    delivered to the main thread, so elsewhere the block runs without a limit."""
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    def _expired(signum, frame):
+        raise ExpressionTimeout()
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def correct_answer_pairs(segments: list) -> list:
+    """(value, type) pairs for the non-empty segments of a stored correctAnswer."""
+    return [(segment.get("value", ""), segment.get("type")) for segment in segments if segment.get("value", "").strip()]
+
+def parse_answer(value: str, answer_type: str):
+    """Parse the answer based on its type, returning a SymPy expression or raw value."""
+    from sympy import simplify, sympify
+    from sympy.core.sympify import SympifyError
+    from sympy.parsing.latex import parse_latex
+    from sympy.parsing.latex.errors import LaTeXParsingError
+    try:
+        if answer_type == "latex":
+            return simplify(parse_latex(value))
+        elif answer_type == "text":
+            # Attempt to convert text to a SymPy expression if it's a number
+            try:
+                return simplify(sympify(value))
+            except SympifyError:
+                return value  # Return raw string if not convertible
+        else:
+            raise ValueError(f"Unsupported answer type: {answer_type}")
+    except (SympifyError, LaTeXParsingError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid {answer_type} value '{value}': {str(e)}")
+
+class ExpressionCache:
+    """
+    LRU of parse_answer() outcomes keyed on (type, whitespace-normalized value): the
+    simplified expression, the raw string for non-numeric text, or the parse error message.
+    Bounded by entry count and by an approximate size (key plus printed result).
+    """
+    def __init__(self, max_entries: int = VERIFY_ANSWER_CACHE_SIZE, max_bytes: int = VERIFY_ANSWER_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (outcome, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, outcome, size: int):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (outcome, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+expression_cache = ExpressionCache()
+
+def parse_answer_cached(value: str, answer_type: str):
+    """parse_answer() through the worker's expression cache; errors are cached and re-raised too."""
+    normalized = " ".join(value.split())
+    key = (answer_type, normalized)
+    outcome = expression_cache.get(key)
+    if outcome is None:
+        try:
+            outcome = ("ok", parse_answer(normalized, answer_type))
+        except ValueError as e:
+            outcome = ("error", str(e))
+        expression_cache.set(key, outcome, len(normalized) + len(str(outcome[1])))
+    kind, result = outcome
+    if kind == "error":
+        raise ValueError(result)
+    return result
+
+def parse_answer_unsimplified(value: str, answer_type: str):
+    """parse_answer() without simplify(), cached; used for fingerprinting test answers."""
+    from sympy import sympify
+    from sympy.core.sympify import SympifyError
+    from sympy.parsing.latex import parse_latex
+    from sympy.parsing.latex.errors import LaTeXParsingError
+    normalized = " ".join(value.split())
+    key = ("unsimplified", answer_type, normalized)
+    outcome = expression_cache.get(key)
+    if outcome is None:
+        try:
+            if answer_type == "latex":
+                outcome = ("ok", parse_latex(normalized))
+            elif answer_type == "text":
+                try:
+                    outcome = ("ok", sympify(normalized))
+                except SympifyError:
+                    outcome = ("ok", normalized)
+            else:
+                outcome = ("error", f"Invalid {answer_type} value '{value}': Unsupported answer type: {answer_type}")
+        except (SympifyError, LaTeXParsingError, ValueError, TypeError) as e:
+            outcome = ("error", f"Invalid {answer_type} value '{value}': {str(e)}")
+        expression_cache.set(key, outcome, len(normalized) + len(str(outcome[1])))
+    kind, result = outcome
+    if kind == "error":
+        raise ValueError(result)
+    return result
+
+@lru_cache(maxsize=256)
+def _symbol_samples(name: str):
+    # Fixed per symbol name, so fingerprints computed at different times are comparable;
+    # both signs, away from 0, to separate e.g. sqrt(x**2) from x
+    import numpy as np
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "little"))
+    magnitudes = rng.uniform(0.5, 2.5, FINGERPRINT_SAMPLES)
+    signs = np.where(rng.random(FINGERPRINT_SAMPLES) < 0.5, -1.0, 1.0)
+    return (magnitudes * signs).astype(complex)
+
+def fingerprint(expr):
+    """Values of expr at FINGERPRINT_SAMPLES fixed points (complex), or None if it cannot be evaluated numerically."""
+    import numpy as np
+    from sympy import Expr, lambdify
+    if not isinstance(expr, Expr):
+        return None
+    symbols = sorted(expr.free_symbols, key=lambda symbol: symbol.name)
+    try:
+        fn = lambdify(symbols, expr, modules="numpy")
+        with np.errstate(all="ignore"):
+            values = np.broadcast_to(np.asarray(fn(*[_symbol_samples(symbol.name) for symbol in symbols]), dtype=complex), (FINGERPRINT_SAMPLES,))
+    except Exception:
+        return None
+    return values if np.all(np.isfinite(values)) else None
+
+def compare_fingerprints(test_values, correct_values):
+    """
+    (verdict, confidence): verdict is True when every sample point agrees, False when at
+    least half clearly differ, None when the samples are inconclusive; confidence is the
+    fraction of sample points supporting the verdict.
+    """
+    if test_values is None or correct_values is None:
+        return None, 0.0
+    import numpy as np
+    scale = np.maximum(np.maximum(np.abs(test_values), np.abs(correct_values)), 1.0)
+    errors = np.abs(test_values - correct_values)
+    if np.all((errors <= FINGERPRINT_AGREE * scale) & (errors <= FINGERPRINT_AGREE_ABS)):
+        return True, 1.0
+    # Large values that are close but not equal (rounding noise or a near miss) fall
+    # through to the symbolic check
+    differing = float(np.mean(errors > FINGERPRINT_DIFFER * scale))
+    if differing >= 0.5:
+        return False, differing
+    return None, 0.0
+
+def fingerprint_cached(value: str, answer_type: str, expr):
+    """fingerprint() of a parsed correct answer, memoized alongside its parse."""
+    if not VERIFY_ANSWER_FAST_PATH:
+        return None
+    key = ("fingerprint", answer_type, " ".join(value.split()))
+    outcome = expression_cache.get(key)
+    if outcome is None:
+        outcome = ("ok", fingerprint(expr))
+        expression_cache.set(key, outcome, len(key[2]) + 16 * FINGERPRINT_SAMPLES)
+    return outcome[1]
+
+def _parse_corrects(answers: list, timeout: float) -> list:
+    """
+    (simplified expression, fingerprint, structured form) for each correct answer that
+    parses. A structured answer (see answer_canonicalizer) is kept even when SymPy cannot
+    parse it, with no expression.
+    """
+    parsed = []
+    for i, (value, answer_type) in enumerate(answers):
+        structured = canonicalize(value)
+        try:
+            with time_limit(timeout):
+                expr = parse_answer_cached(value, answer_type)
+                parsed.append((expr, fingerprint_cached(value, answer_type, expr), structured))
+        except (ValueError, ExpressionTimeout) as e:
+            if structured is not None:
+                parsed.append((None, None, structured))
+            elif isinstance(e, ExpressionTimeout):
+                raise
+            else:
+                logger.debug(f"Failed to parse correctAnswer[{i}]: '{value}' (type: {answer_type}) - Error: {str(e)}")
+                continue  # Skip invalid entries
+    return parsed
+
+def _is_correct_and(simplified_test, simplified_correct) -> bool:
+    # Handle different types: compare symbolically or as strings if not convertible
+    if (isinstance(simplified_test, str) or isinstance(simplified_correct, str)) and not (simplified_test.is_number and simplified_correct.is_number):
+        return str(simplified_test) == str(simplified_correct)
+    is_correct = simplified_test.equals(simplified_correct)
+    if simplified_test.is_number and simplified_correct.is_number:
+        precision = 10
+        rounded_test = round(float(simplified_test), precision)
+        rounded_correct = round(float(simplified_correct), precision)
+        is_correct = rounded_test == rounded_correct
+    return is_correct
+
+def _is_correct_or(simplified_test, simplified_corrects: list) -> bool:
+    is_correct = any(
+        (isinstance(simplified_test, str) or isinstance(simplified_correct, str)) and not (simplified_test.is_number and simplified_correct.is_number) and str(simplified_test) == str(simplified_correct)
+        or (not isinstance(simplified_test, str) and not isinstance(simplified_correct, str) and simplified_test.equals(simplified_correct))
+        for simplified_correct in simplified_corrects
+    )
+    if all(simplified_correct.is_number for simplified_correct in simplified_corrects) and simplified_test.is_number:
+        precision = 10
+        rounded_test = round(float(simplified_test), precision)
+        is_correct = any(
+            round(float(simplified_correct), precision) == rounded_test
+            for simplified_correct in simplified_corrects
+        )
+    return is_correct
+
+class _TestAnswer:
+    """
+    A test answer. Structured answers are compared without SymPy and only parsed if the
+    structures cannot be compared; other answers are parsed up front (unsimplified with the
+    fast path) and simplified on demand when the fingerprint comparison is inconclusive.
+    """
+    def __init__(self, value: str, answer_type: str):
+        self.value = value
+        self.answer_type = answer_type
+        self.structured = canonicalize(value)
+        self.expr = None
+        self.fingerprint = None
+        self.parsed = False
+        self.simplified = False
+
+    def parse(self, timeout: float):
+        """The parsed expression; raises ValueError if the answer does not parse."""
+        if not self.parsed:
+            self.parsed = True
+            with time_limit(timeout):
+                if VERIFY_ANSWER_FAST_PATH:
+                    self.expr = parse_answer_unsimplified(self.value, self.answer_type)
+                    self.fingerprint = fingerprint(self.expr)
+                else:
+                    self.expr = parse_answer_cached(self.value, self.answer_type)
+                    self.simplified = True
+        if self.expr is None:
+            raise ValueError(f"Invalid {self.answer_type} value '{self.value}'")
+        return self.expr
+
+    def simplify(self, timeout: float):
+        self.parse(timeout)
+        if not self.simplified:
+            with time_limit(timeout):
+                try:
+                    self.expr = parse_answer_cached(self.value, self.answer_type)
+                except ValueError:
+                    pass  # keep the unsimplified expression
+            self.simplified = True
+        return self.expr
+
+    def display(self) -> str:
+        return str(self.expr) if self.expr is not None else describe(self.structured)
+
+def _parse_tests(test_answers: list, timeout: float) -> list:
+    parsed = []
+    for i, (value, answer_type) in enumerate(test_answers):
+        test = _TestAnswer(value, answer_type)
+        if test.structured is None:
+            try:
+                test.parse(timeout)
+            except ValueError as e:
+                logger.debug(f"Failed to parse testAnswer[{i}]: '{value}' (type: {answer_type}) - Error: {str(e)}")
+                continue  # Skip invalid entries
+        parsed.append(test)
+    return parsed
+
+def _atom_latex(atom) -> str:
+    if isinstance(atom, Fraction):
+        return str(atom.numerator) if atom.denominator == 1 else f"\\frac{{{atom.numerator}}}{{{atom.denominator}}}"
+    return atom
+
+def _atoms_equal(left, right, timeout: float) -> bool:
+    """Symbolic comparison of two structured-answer atoms that are not both rational literals."""
+    try:
+        with time_limit(timeout):
+            left_expr = parse_answer_cached(_atom_latex(left), "latex")
+            right_expr = parse_answer_cached(_atom_latex(right), "latex")
+            verdict, _ = compare_fingerprints(fingerprint(left_expr), fingerprint(right_expr)) if VERIFY_ANSWER_FAST_PATH else (None, 0.0)
+            return verdict if verdict is not None else bool(_is_correct_and(left_expr, right_expr))
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+def _structured_verdict(test: _TestAnswer, correct_structured, timeout: float):
+    if test.structured is None or correct_structured is None:
+        return None
+    return compare_structured(test.structured, correct_structured, lambda left, right: _atoms_equal(left, right, timeout))
+
+def _correct_display(expr, structured) -> str:
+    return describe(structured) if structured is not None else str(expr)
+
+def _method(verdict, confidence: float) -> dict:
+    if verdict is None:
+        return {"method": "symbolic"}
+    return {"method": "fingerprint", "confidence": confidence, "samples": FINGERPRINT_SAMPLES}
+
+def _expression_verdict_and(test: _TestAnswer, simplified_correct, correct_fingerprint, timeout: float):
+    """(isCorrect, method fields) for one test/correct pair compared as expressions."""
+    try:
+        test.parse(timeout)
+    except ValueError:
+        return False, {"method": "symbolic"}
+    if simplified_correct is None:
+        return False, {"method": "symbolic"}
+    verdict, confidence = compare_fingerprints(test.fingerprint, correct_fingerprint)
+    if verdict is not None:
+        return verdict, _method(verdict, confidence)
+    simplified_test = test.simplify(timeout)
+    with time_limit(timeout):
+        return _is_correct_and(simplified_test, simplified_correct), _method(None, 0.0)
+
+def _expression_verdict_or(test: _TestAnswer, corrects: list, timeout: float):
+    """(isCorrect, method fields) for one test answer against any of the correct answers."""
+    corrects = [(expr, values) for expr, values, _ in corrects if expr is not None]
+    try:
+        test.parse(timeout)
+    except ValueError:
+        return False, {"method": "symbolic"}
+    if not corrects:
+        return False, {"method": "symbolic"}
+    verdicts = [compare_fingerprints(test.fingerprint, correct_fingerprint) for _, correct_fingerprint in corrects]
+    if any(verdict is True for verdict, _ in verdicts):
+        return True, _method(True, 1.0)
+    if all(verdict is False for verdict, _ in verdicts):
+        return False, _method(False, min(confidence for _, confidence in verdicts))
+    simplified_test = test.simplify(timeout)
+    with time_limit(timeout):
+        return _is_correct_or(simplified_test, [expr for expr, _ in corrects]), _method(None, 0.0)
+
+def _compare(corrects: list, test_answers: list, relationship: str, timeout: float) -> dict:
+    """Compare test answers against (simplified expression, fingerprint, structured form) triples for the correct answers."""
+    if not corrects:
+        raise VerificationError("No valid correct answers provided")
+    expected = [_correct_display(expr, structured) for expr, _, structured in corrects]
+    logger.debug(f"Simplified correct answers: {expected}")
+
+    # Structured test answers are compared first, so they are only parsed by SymPy when they have to be
+    tests = _parse_tests(test_answers, timeout)
+    if not tests:
+        raise VerificationError("No valid test answers provided")
+
+    # Evaluate based on correctAnswerRelationship
+    results = []
+    if relationship == "and":
+        if len(tests) != len(corrects):
+            raise VerificationError("Number of test answers must match number of correct answers for 'and' relationship")
+        for test, (simplified_correct, correct_fingerprint, correct_structured), expected_answer in zip(tests, corrects, expected):
+            is_correct = _structured_verdict(test, correct_structured, timeout)
+            if is_correct is not None:
+                method = {"method": "structured"}
+            else:
+                is_correct, method = _expression_verdict_and(test, simplified_correct, correct_fingerprint, timeout)
+            results.append({
+                "testAnswer": test.display() if method["method"] != "structured" else describe(test.structured),
+                "isCorrect": is_correct,
+                "expectedAnswer": expected_answer,
+                **method,
+            })
+    elif relationship == "or":
+        for test in tests:
+            verdicts = [_structured_verdict(test, structured, timeout) for _, _, structured in corrects]
+            if any(verdict is True for verdict in verdicts) or all(verdict is False for verdict in verdicts):
+                is_correct, method = any(verdicts), {"method": "structured"}
+            else:
+                is_correct, method = _expression_verdict_or(test, corrects, timeout)
+            results.append({
+                "testAnswer": test.display() if method["method"] != "structured" else describe(test.structured),
+                "isCorrect": is_correct,
+                "expectedAnswers": expected,
+                **method,
+            })
+    else:
+        raise VerificationError("Invalid correctAnswerRelationship: must be 'or' or 'and'")
+
+    # Determine overall isCorrect based on relationship and all test answers
+    overall_is_correct = all(result["isCorrect"] for result in results) if relationship == "and" else any(result["isCorrect"] for result in results)
+
+    return {
+        "isCorrect": overall_is_correct,
+        "correctAnswers": expected,
+        "results": results
+    }
+
+def verify_answers(correct_answers: list, test_answers: list, relationship: str, timeout: float = None) -> dict:
+    """
+    Compare test answers with correct answers; both are lists of (value, type) pairs.
+    Every parse and comparison gets `timeout` seconds. Raises VerificationError for an
+    unverifiable request and ExpressionTimeout when an expression runs too long.
+    """
+    from sympy.core.sympify import SympifyError
+    try:
+        # Parse and simplify all correct answers
+        corrects = _parse_corrects(correct_answers, timeout)
+        return _compare(corrects, test_answers, relationship, timeout)
+    except (SympifyError, ValueError, TypeError) as e:
+        raise VerificationError(f"Invalid expression: {str(e)}")
+
+def compile_answer(value: str, answer_type: str, timeout: float = None) -> dict:
+    """
+    Canonical stored form of one correct answer: parse status plus, for expressions, the
+    srepr of the simplified form, its hash and its numeric fingerprint as [re, im] pairs
+    (null when it cannot be evaluated), and for structured answers their to_json() form.
+    Loaded back by load_canonical_answer().
+    """
+    entry = {"type": answer_type, "value": value}
+    structured = canonicalize(value)
+    if structured is not None:
+        entry["structured"] = to_json(structured)
+    try:
+        with time_limit(timeout):
+            parsed = parse_answer_cached(value, answer_type)
+    except (ExpressionTimeout, ValueError) as e:
+        if structured is not None:
+            # Compared structurally; SymPy is only needed when a test answer is not structured
+            entry.update(status="ok", kind="structured", text=describe(structured))
+        elif isinstance(e, ExpressionTimeout):
+            entry["status"] = "timeout"
+        else:
+            entry.update(status="error", error=str(e))
+        return entry
+    if isinstance(parsed, str):
+        entry.update(status="ok", kind="text", text=parsed)
+    else:
+        from sympy import srepr
+        tree = srepr(parsed)
+        values = fingerprint_cached(value, answer_type, parsed)
+        entry.update(
+            status="ok", kind="expr", srepr=tree, hash=hashlib.sha256(tree.encode()).hexdigest(), text=str(parsed),
+            fingerprint=None if values is None else [[float(v.real), float(v.imag)] for v in values],
+        )
+    return entry
+
+def compile_correct_answers(correct_answers: list, timeout: float = None) -> dict:
+    """Canonical form of a question's correct answers, given as (value, type) pairs."""
+    return {
+        "version": CANONICAL_VERSION,
+        "answers": [compile_answer(value, answer_type, timeout) for value, answer_type in correct_answers],
+    }
+
+def load_canonical_answer(entry: dict):
+    """
+    (expression or raw text, fingerprint, structured form) for a compile_answer() entry;
+    raises ValueError for answers that failed to parse.
+    """
+    status = entry.get("status")
+    structured = from_json(entry["structured"]) if entry.get("structured") else None
+    if status == "timeout":
+        # Compilation ran out of time; try again now under the caller's time limit
+        expr = parse_answer_cached(entry["value"], entry["type"])
+        return expr, fingerprint_cached(entry["value"], entry["type"], expr), structured
+    if status != "ok":
+        raise ValueError(entry.get("error", f"Invalid {entry.get('type')} value '{entry.get('value')}'"))
+    if entry["kind"] == "structured":
+        return None, None, structured
+    if entry["kind"] == "text":
+        return entry["text"], None, structured
+    import numpy as np
+    from sympy import sympify
+    key = ("srepr", entry["hash"])
+    outcome = expression_cache.get(key)
+    if outcome is None:
+        # srepr output only uses SymPy constructors, so rebuilding it skips parse_latex and simplify
+        outcome = ("ok", sympify(entry["srepr"]))
+        expression_cache.set(key, outcome, len(entry["srepr"]))
+    stored = entry.get("fingerprint")
+    values = np.array([complex(re, im) for re, im in stored]) if stored and VERIFY_ANSWER_FAST_PATH else None
+    return outcome[1], values, structured
+
+def verify_against_canonical(canonical: dict, test_answers: list, relationship: str, timeout: float = None) -> dict:
+    """verify_answers() with the correct side taken from a stored compile_correct_answers() result."""
+    from sympy.core.sympify import SympifyError
+    try:
+        corrects = []
+        for i, entry in enumerate(canonical.get("answers", [])):
+            try:
+                with time_limit(timeout):
+                    corrects.append(load_canonical_answer(entry))
+            except ValueError as e:
+                logger.debug(f"Skipping canonical correctAnswer[{i}]: {str(e)}")
+        return _compare(corrects, test_answers, relationship, timeout)
+    except (SympifyError, ValueError, TypeError) as e:
+        raise VerificationError(f"Invalid expression: {str(e)}")
+
+def _worker_result(result) -> dict:
+    # Every worker call reports this worker's cache statistics for the parent to aggregate
+    return {"result": result, "pid": os.getpid(), "cache": expression_cache.stats()}
+
+def run_verification(correct_answers: list, test_answers: list, relationship: str, timeout: float = None, canonical: dict = None) -> dict:
+    """Worker entry point for verification, against raw correct answers or a stored canonical form."""
+    if canonical is not None:
+        return _worker_result(verify_against_canonical(canonical, test_answers, relationship, timeout))
+    return _worker_result(verify_answers(correct_answers, test_answers, relationship, timeout))
+
+def run_warm_up() -> dict:
+    """Worker entry point that imports SymPy, the LaTeX parser and NumPy ahead of the first real check."""
+    verify_answers([("\\frac{x^{2}-1}{x+1}", "latex")], [("x-1", "text")], "or")
+    return _worker_result(None)
+
+def run_compile(correct_answers: list, timeout: float = None) -> dict:
+    """Worker entry point for compile_correct_answers()."""
+    return _worker_result(compile_correct_answers(correct_answers, timeout))
+
+def run_compile_batch(answer_lists: list, timeout: float = None) -> dict:
+    """Worker entry point for compile_correct_answers() over several questions' correct answers."""
+    return _worker_result([compile_correct_answers(correct_answers, timeout) for correct_answers in answer_lists])
+
+def run_verification_batch(items: list, timeout: float = None) -> dict:
+    """
+    Worker entry point for several independent checks in one call; items are
+    (canonical, test_answers, relationship), with canonical None when it could not be
+    compiled. Each item succeeds or fails on its own.
+    """
+    results = []
+    for canonical, test_answers, relationship in items:
+        if canonical is None:
+            # The question's correct answer could not be compiled in time
+            results.append({"isCorrect": None, "status": "could_not_verify", "detail": "The correct answer could not be prepared for checking", "correctAnswers": [], "results": []})
+            continue
+        try:
+            result = verify_against_canonical(canonical, test_answers, relationship, timeout)
+            result["status"] = "verified"
+        except VerificationError as e:
+            result = {"isCorrect": False, "status": "invalid", "detail": str(e), "correctAnswers": [], "results": []}
+        except ExpressionTimeout:
+            result = {"isCorrect": None, "status": "could_not_verify", "detail": f"An expression took longer than {timeout} s to check", "correctAnswers": [], "results": []}
+        results.append(result)
+    return _worker_result(results)
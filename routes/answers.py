@@ -1,16 +1,10 @@
 # routes/answers.py
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from datetime import datetime
 from .auth import get_current_user
 from bson import ObjectId
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 
 router = APIRouter(prefix="/api/answers", tags=["answers"])
 
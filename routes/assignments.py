@@ -1,15 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from datetime import datetime
 from bson import ObjectId
+from metrics import metrics
 from .auth import get_current_user
-import os
-from dotenv import load_dotenv
+from .verify_answer import AnswerItem, AnswerVerifierBusy, answer_verifier, canonical_answers_for
+import logging
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/assignments", tags=["assignments"])
 
@@ -17,6 +18,14 @@ class AssignmentCreate(BaseModel):
     questionIds: list[str]
     studentIds: list[str]
 
+class SubmissionResponse(BaseModel):
+    questionId: str
+    correctAnswerRelationship: str = "or"  # "or" or "and" for multiple correct answers
+    testAnswers: list[AnswerItem]
+
+class AssignmentSubmission(BaseModel):
+    responses: list[SubmissionResponse]
+
 @router.post("/")
 async def create_assignment(assignment: AssignmentCreate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["admin", "tutor"]:
@@ -98,4 +107,94 @@ async def submit_assignment(assignment_id: str, current_user: dict = Depends(get
     )
     if result.modified_count == 0:
         raise HTTPException(400, "Failed to submit assignment")
-    return {"message": "Assignment submitted"}
\ No newline at end of file
+    return {"message": "Assignment submitted"}
+
+@router.post("/submit/{assignment_id}/responses")
+async def submit_assignment_responses(assignment_id: str, submission: AssignmentSubmission, current_user: dict = Depends(get_current_user)):
+    """
+    Grade and submit a whole assignment at once: every response is verified against its
+    question's canonical answer on the verification pool, then all answers are inserted
+    together, the student's performance counters are bumped once and the assignment is
+    marked submitted.
+    """
+    if current_user["role"] != "student":
+        raise HTTPException(403, "Only students can submit assignments")
+    assignment = await db.assignments.find_one({"id": assignment_id}, {"_id": 0, "studentId": 1, "questionIds": 1, "submitted": 1})
+    if not assignment or assignment["studentId"] != current_user["id"]:
+        raise HTTPException(404, "Assignment not found or unauthorized")
+    if assignment.get("submitted"):
+        raise HTTPException(409, "Assignment already submitted")
+
+    question_ids = [response.questionId for response in submission.responses]
+    if len(set(question_ids)) != len(question_ids):
+        raise HTTPException(400, "Each question may only be answered once")
+    unknown_ids = set(question_ids) - set(assignment.get("questionIds", []))
+    if unknown_ids:
+        raise HTTPException(400, f"Questions not in this assignment: {unknown_ids}")
+    questions = await db.questions.find(
+        {"id": {"$in": question_ids}},
+        {"_id": 0, "id": 1, "correctAnswer": 1, "canonicalAnswer": 1, "category": 1, "difficulty": 1},
+    ).to_list(None)
+    questions_by_id = {question["id"]: question for question in questions}
+    missing_ids = set(question_ids) - set(questions_by_id)
+    if missing_ids:
+        raise HTTPException(404, f"Questions not found: {missing_ids}")
+
+    try:
+        # Only questions created before canonical answers existed need a compile here, all in one batch
+        canonicals = await canonical_answers_for([questions_by_id[question_id] for question_id in question_ids])
+        items = [
+            (canonical, [(ans.value, ans.type) for ans in response.testAnswers if ans.value.strip()], response.correctAnswerRelationship)
+            for canonical, response in zip(canonicals, submission.responses)
+        ]
+        verifications = await answer_verifier.verify_batch(items)
+    except AnswerVerifierBusy:
+        raise HTTPException(status_code=503, detail="Answer verification is busy, please retry", headers={"Retry-After": "1"})
+
+    # Claim the submission before writing answers, so a concurrent submit cannot record them twice
+    result = await db.assignments.update_one({"id": assignment_id, "submitted": {"$ne": True}}, {"$set": {"submitted": True}})
+    if result.matched_count == 0:
+        raise HTTPException(409, "Assignment already submitted")
+
+    now = datetime.utcnow()
+    answer_docs = []
+    for response, verification in zip(submission.responses, verifications):
+        question = questions_by_id[response.questionId]
+        answer_docs.append({
+            "id": str(ObjectId()),
+            "studentId": current_user["id"],
+            "questionId": response.questionId,
+            "assignmentId": assignment_id,
+            "answer": ", ".join(ans.value for ans in response.testAnswers if ans.value.strip()),
+            "category": question.get("category", ""),
+            "difficulty": question.get("difficulty", ""),
+            "isCorrect": verification["isCorrect"],
+            "verificationStatus": verification["status"],
+            "createdAt": now,
+        })
+    if answer_docs:
+        try:
+            await db.answers.insert_many(answer_docs)
+            total_correct = sum(1 for doc in answer_docs if doc["isCorrect"] is True)
+            performance_update = {"$inc": {"performanceData.totalAttempts": len(answer_docs)}}
+            if total_correct:
+                performance_update["$inc"]["performanceData.totalCorrect"] = total_correct
+            await db.users.update_one({"id": current_user["id"]}, performance_update)
+        except Exception as e:
+            # Undo the claim (and any answers already written) so the student can submit again
+            logger.error(f"Recording submission of assignment {assignment_id} failed: {str(e)}")
+            await db.answers.delete_many({"id": {"$in": [doc["id"] for doc in answer_docs]}})
+            await db.assignments.update_one({"id": assignment_id}, {"$set": {"submitted": False}})
+            raise HTTPException(500, "Failed to record the submission, please retry")
+    metrics.inc("assignments.batch_submitted")
+    metrics.observe("assignments.batch_size", len(answer_docs))
+
+    return {
+        "message": "Assignment submitted",
+        "totalCorrect": sum(1 for doc in answer_docs if doc["isCorrect"] is True),
+        "totalAnswers": len(answer_docs),
+        "results": [
+            {"questionId": doc["questionId"], "answerId": doc["id"], **verification}
+            for doc, verification in zip(answer_docs, verifications)
+        ],
+    }
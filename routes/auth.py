@@ -2,25 +2,36 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
+from metrics import metrics
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-import bcrypt
 import os
 from dotenv import load_dotenv
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import hashlib
+import time
 import logging
+from .password_hashing import password_hasher, PasswordHasherBusy
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 JWT_SECRET = os.getenv("JWT_SECRET")
 
+# Principal cache settings: entries live for at most PRINCIPAL_CACHE_TTL seconds
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# Claims mode: short-lived access tokens carry the whole principal, so get_current_user
+# needs no database read; /api/auth/refresh re-issues them while tokenVersion matches.
+AUTH_CLAIMS_MODE = os.getenv("AUTH_CLAIMS_MODE", "false").lower() in ("1", "true", "yes")
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(7 * 24 * 3600)))
+MATH_ROLES = ["student", "tutor", "admin"]
+
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -28,30 +39,158 @@ class LoginRequest(BaseModel):
     email: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class PrincipalCache:
+    """
+    Bounded, TTL-based cache of authenticated principals keyed by (user id, token).
+    Entries are evicted least-recently-used once maxsize is reached, and all entries
+    of a user can be dropped at once with invalidate() when that user changes.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user_id, token digest) -> (expires_at, principal)
+        self._keys_by_user = {}  # user_id -> set of cache keys
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user_id: str, token: str):
+        return (user_id, hashlib.sha256(token.encode("utf-8")).hexdigest())
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def get(self, user_id: str, token: str):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            self.misses += 1
+            return None
+        key = self._key(user_id, token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(principal)
+
+    def set(self, user_id: str, token: str, principal: dict):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        key = self._key(user_id, token)
+        self._entries[key] = (time.monotonic() + self.ttl, dict(principal))
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *user_ids: str):
+        """Drop every cached principal belonging to the given user ids."""
+        for user_id in user_ids:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+metrics.gauge("auth.principal_cache", principal_cache.stats)
+
+def invalidate_principals(*user_ids: str):
+    """Evict cached principals for users whose record has just been written."""
+    principal_cache.invalidate(*[user_id for user_id in user_ids if user_id])
+
 async def get_user_by_id(user_id: str):
-    logger.info(f"Fetching user with name: {user_id}")
+    logger.debug(f"Fetching user with id: {user_id}")
     user = await db.users.find_one({"id": user_id})
-    if user:
-        logger.info(f"User found: {user['id']}, role: {user['role']}")
-    else:
-        logger.warning(f"User not found for name: {user_id}")
+    if not user:
+        logger.warning(f"User not found for id: {user_id}")
     return user
 
+def create_access_token(user: dict) -> str:
+    """Issue a claims-mode access token carrying the full principal and the user's tokenVersion."""
+    now = datetime.now(timezone.utc)
+    claims = {
+        "id": user["id"],
+        "role": user["role"],
+        "name": user["name"],
+        "language": user["language"],
+        "tokenVersion": user.get("tokenVersion", 0),
+        "type": "access",
+        "iat": now,
+        "exp": now + timedelta(seconds=ACCESS_TOKEN_TTL),
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+def create_refresh_token(user: dict) -> str:
+    now = datetime.now(timezone.utc)
+    claims = {
+        "id": user["id"],
+        "tokenVersion": user.get("tokenVersion", 0),
+        "type": "refresh",
+        "iat": now,
+        "exp": now + timedelta(seconds=REFRESH_TOKEN_TTL),
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        logger.info(f"Decoding token: {token}")
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        logger.info(f"Payload: {payload}")  # Changed from error to info
         user_id = payload.get("id")
         role = payload.get("role")
+        if payload.get("type") == "refresh":
+            logger.error("Invalid token: refresh token used as access token")
+            raise HTTPException(status_code=401, detail="Invalid token")
         if not user_id or not role:
             logger.error("Invalid token: Missing user_id or role")
             raise HTTPException(status_code=401, detail="Invalid token")
+        # Claims-mode access tokens are self-contained and short-lived: no database read
+        if AUTH_CLAIMS_MODE and payload.get("type") == "access":
+            return {"id": user_id, "role": role, "name": payload.get("name"), "language": payload.get("language")}
+        principal = principal_cache.get(user_id, token)
+        if principal is not None:
+            return principal
         user = await get_user_by_id(user_id)
         if not user:
             logger.error(f"User not found for id: {user_id}")
             raise HTTPException(status_code=401, detail="User not found")
-        return {"id": user["id"], "role": user["role"], "name": user["name"], "language": user["language"]}
+        if user.get("disabled", False):
+            logger.warning(f"Rejected token for disabled user: {user_id}")
+            raise HTTPException(status_code=401, detail="User is disabled")
+        principal = {"id": user["id"], "role": user["role"], "name": user["name"], "language": user["language"]}
+        principal_cache.set(user_id, token, principal)
+        return principal
     except JWTError as e:
         logger.error(f"JWTError: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -59,28 +198,68 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 @router.post("/login/")
 async def login(request: LoginRequest):
     logger.info(f"Login attempt for email: {request.email}")
-    logger.info(f"Password: {request.password}")  # Be cautious with logging passwords in production    
     
     user = await db.users.find_one({"email": request.email})
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not user or not pwd_context.verify(request.password, user["password"]):
+    # bcrypt runs on the password hashing pool; shed load instead of queueing without bound
+    try:
+        password_ok = await password_hasher.verify(request.password, user["password"])
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Login temporarily unavailable, please retry", headers={"Retry-After": "1"})
+    if not password_ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Check for math-related roles
-    math_roles = ["student", "tutor", "admin"]
-    if user["role"] not in math_roles:
+    if user["role"] not in MATH_ROLES:
         raise HTTPException(status_code=403, detail="User does not have a math-related role")
     
+    user_info = {
+        "id": user["id"],
+        "role": user["role"],
+        "name": user["name"],
+        "email": user["email"]
+    }
+    if AUTH_CLAIMS_MODE:
+        return {
+            "access_token": create_access_token(user),
+            "refresh_token": create_refresh_token(user),
+            "token_type": "bearer",
+            "expires_in": ACCESS_TOKEN_TTL,
+            "user": user_info
+        }
+    
     # Generate JWT token
-    token = jwt.encode({"id": user["id"], "role": user["role"]}, os.getenv("JWT_SECRET"), algorithm="HS256")
+    token = jwt.encode({"id": user["id"], "role": user["role"]}, JWT_SECRET, algorithm="HS256")
     return {
         "access_token": token,
-        "user": {
-            "id": user["id"],
-            "role": user["role"],
-            "name": user["name"],
-            "email": user["email"]
-        }
+        "user": user_info
+    }
+
+@router.post("/refresh")
+async def refresh(request: RefreshRequest):
+    try:
+        payload = jwt.decode(request.refresh_token, JWT_SECRET, algorithms=["HS256"])
+    except JWTError as e:
+        logger.error(f"JWTError on refresh: {str(e)}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("type") != "refresh" or not payload.get("id"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    user = await get_user_by_id(payload["id"])
+    if not user or user.get("disabled", False):
+        raise HTTPException(status_code=401, detail="User not found or disabled")
+    # Bumping tokenVersion in users.py revokes every refresh token issued before the bump
+    if payload.get("tokenVersion", 0) != user.get("tokenVersion", 0):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+    if user["role"] not in MATH_ROLES:
+        raise HTTPException(status_code=403, detail="User does not have a math-related role")
+    
+    return {
+        "access_token": create_access_token(user),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL
     }
 
 @router.get("/current-user")
@@ -90,4 +269,10 @@ async def get_current_user_endpoint(current_user: dict = Depends(get_current_use
         "role": current_user["role"],
         "name": current_user["name"],
         "language": current_user["language"],
-    }
\ No newline at end of file
+    }
+
+@router.get("/cache-stats")
+async def get_principal_cache_stats(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view cache statistics")
+    return principal_cache.stats()
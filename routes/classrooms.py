@@ -1,15 +1,9 @@
 # routes/classrooms.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from datetime import datetime
 from typing import List
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 
 router = APIRouter(prefix="/api/classrooms", tags=["classrooms"])
 
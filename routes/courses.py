@@ -1,18 +1,13 @@
 # routes/courses.py
 from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+from database import db
 from typing import List
 from datetime import datetime
 from models.course import Course, CourseResponse
 from .auth import get_current_user
+from .knowledge_point_catalog import knowledge_point_catalog
 import uuid
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
-
 router = APIRouter(prefix="/api/courses", tags=["courses"])
 
 @router.post("/", response_model=CourseResponse)
@@ -22,9 +17,7 @@ async def create_course(course: Course, current_user: dict = Depends(get_current
     
     # Validate knowledge point and question IDs
     if course.knowledgePointIds:
-        valid_kps = await db.knowledge_points.find(
-            {"id": {"$in": course.knowledgePointIds}, "isActive": True}
-        ).to_list(None)
+        valid_kps = await knowledge_point_catalog.find_active(course.knowledgePointIds)
         if len(valid_kps) != len(course.knowledgePointIds):
             raise HTTPException(400, "Some knowledge point IDs are invalid or inactive")
     
@@ -74,9 +67,7 @@ async def get_courses(current_user: dict = Depends(get_current_user)):
     
     courses = await db.courses.find({"isActive": True}).to_list(None)
     for course in courses:
-        course["knowledgePointIds"] = await db.knowledge_points.find(
-            {"id": {"$in": course["knowledgePointIds"]}, "isActive": True}
-        ).to_list(None)
+        course["knowledgePointIds"] = await knowledge_point_catalog.find_active(course["knowledgePointIds"])
         course["knowledgePointIds"] = [
             {
                 "id": kp["id"],
@@ -110,9 +101,7 @@ async def update_course(id: str, course: Course, current_user: dict = Depends(ge
     
     # Validate knowledge point and question IDs
     if course.knowledgePointIds:
-        valid_kps = await db.knowledge_points.find(
-            {"id": {"$in": course.knowledgePointIds}, "isActive": True}
-        ).to_list(None)
+        valid_kps = await knowledge_point_catalog.find_active(course.knowledgePointIds)
         if len(valid_kps) != len(course.knowledgePointIds):
             raise HTTPException(400, "Some knowledge point IDs are invalid or inactive")
     
@@ -1,9 +1,11 @@
-import httpx
+import llm_clients
 import json
 import os
 import base64
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from routes.segment_stream import SegmentStreamParser
+from routes.answer_canonicalizer import annotate_segments
 
 load_dotenv()
 xai_api_key = os.getenv("XAI_API_KEY")
@@ -11,15 +13,35 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+GROK_URL = llm_clients.CHAT_COMPLETIONS_PATH  # relative to the shared xAI client's base URL
+
 async def call_grok_api(prompt):
-    url = "https://api.x.ai/v1/chat/completions"
+    url = GROK_URL
     headers = {"Authorization": f"Bearer {xai_api_key}", "Content-Type": "application/json"}
     payload = {"model": "grok-3", "messages": [{"role": "user", "content": prompt}], "max_tokens": 2000}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(url, headers=headers, json=payload)
+    client = llm_clients.get_client("xai")
+    response = await client.post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"]
+
+async def stream_grok_api(prompt):
+    """Same request as call_grok_api with stream=True; yields the content deltas as they arrive."""
+    headers = {"Authorization": f"Bearer {xai_api_key}", "Content-Type": "application/json"}
+    payload = {"model": "grok-3", "messages": [{"role": "user", "content": prompt}], "max_tokens": 2000, "stream": True}
+    client = llm_clients.get_client("xai")
+    async with client.stream("POST", GROK_URL, headers=headers, json=payload) as response:
         response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                yield delta
 
 def merge_consecutive_newlines(result):
     """
@@ -41,7 +63,7 @@ def merge_consecutive_newlines(result):
             result[key] = new_items
     return result
 
-async def process_math_question(request: BaseModel):
+def build_math_question_prompt(request: BaseModel) -> str:
     # Precompute the base64 example with escaped backslashes
     base64_example = base64.b64encode(b'\\int_0^1 x \\, dx').decode()
     logger.info(f"Base64 example computed: {base64_example}")
@@ -57,7 +79,28 @@ async def process_math_question(request: BaseModel):
     })
     prompt = f"Generate a {request.difficulty} math question with an integral, a fraction, a matrix, a sum, and a limit, mixed with explanatory text across multiple paragraphs in the 'question' field. Return a JSON object with 'question' and 'correctAnswer' fields, each a JSON array where each element has 'type' ('text', 'latex', or 'newline') and 'value'. Use 'text' for plain text, 'latex' for LaTeX expressions (encoded in base64), and 'newline' for paragraph breaks in 'question'. For 'correctAnswer', provide only the final answer as a single 'latex' or 'text' element, encoded in base64. Example: {example}."
     logger.info(f"Using prompt: {prompt}")
+    return prompt
+
+def decode_latex_segment(key: str, item: dict) -> dict:
+    """Decode a base64 'latex' segment in place, keeping the original in value64."""
+    try:
+        original_value = item["value"]  # Store original base64
+        item["value"] = base64.b64decode(item["value"].encode()).decode()  # Decode to value
+        item["value64"] = original_value  # Assign original base64 to value64
+        logger.debug(f"Decoded item in {key}: {item}")
+    except base64.binascii.Error as e:
+        logger.error(f"Base64 decoding error for item {item} in {key}: {e}")
+        item["value"] = "Decoding Error"
+        item["value64"] = item.get("value", "")
+    return item
+
+async def process_math_question(request: BaseModel):
+    prompt = build_math_question_prompt(request)
     response = await call_grok_api(prompt)
+    return parse_math_question(response)
+
+def parse_math_question(response: str) -> dict:
+    """Turn a completion in the build_math_question_prompt format into question/correctAnswer segments."""
     result = json.loads(response)
     # For every single 'newline', convert to two consecutive 'newline' elements
     for key in ["question", "correctAnswer"]:
@@ -76,26 +119,48 @@ async def process_math_question(request: BaseModel):
         if key in result and isinstance(result[key], list):
             for item in result[key]:
                 if item["type"] == "latex":
-                    try:
-                        original_value = item["value"]  # Store original base64
-                        item["value"] = base64.b64decode(item["value"].encode()).decode()  # Decode to value
-                        item["value64"] = original_value  # Assign original base64 to value64
-                        logger.debug(f"Decoded item in {key}: {item}")
-                    except base64.binascii.Error as e:
-                        logger.error(f"Base64 decoding error for item {item} in {key}: {e}")
-                        item["value"] = "Decoding Error"
-                        item["value64"] = item.get("value", "")
+                    decode_latex_segment(key, item)
                 elif item["type"] == "newline":
                     logger.debug(f"Found newline in {key}: {item}")
     # Ensure correctAnswer contains only the final answer
     if "correctAnswer" in result and len(result["correctAnswer"]) > 1:
         logger.warning(f"Multiple segments in correctAnswer, keeping only the last one: {result['correctAnswer']}")
         result["correctAnswer"] = [result["correctAnswer"][-1]]  # Keep only the last segment
+    annotate_segments(result.get("correctAnswer", []))
     
     result = merge_consecutive_newlines(result)  # Convert consecutive newlines to paragraphs
     logger.info(f"Processed result: {result}")
     return result
 
+async def stream_math_question(request: BaseModel):
+    """
+    Streaming variant of process_math_question. Yields ("question", segment) as soon as each
+    question segment closes in the streamed completion, then ("correctAnswer", segment) once
+    the response is complete, since only the last answer segment is kept. Segments match the
+    non-streaming result: latex decoded, runs of newlines collapsed to one.
+    """
+    prompt = build_math_question_prompt(request)
+    parser = SegmentStreamParser()
+    previous_type = None
+    last_answer = None
+    async for delta in stream_grok_api(prompt):
+        for key, item in parser.feed(delta):
+            if key == "correctAnswer":
+                last_answer = item
+            elif key == "question":
+                if item.get("type") == "newline" and previous_type == "newline":
+                    continue
+                previous_type = item.get("type")
+                if previous_type == "latex":
+                    decode_latex_segment(key, item)
+                yield key, item
+    if last_answer is not None:
+        if last_answer.get("type") == "latex":
+            decode_latex_segment("correctAnswer", last_answer)
+        annotate_segments([last_answer])
+        yield "correctAnswer", last_answer
+    logger.info(f"Streamed {parser.segments} segments")
+
 # Example usage
 import asyncio
 if __name__ == "__main__":
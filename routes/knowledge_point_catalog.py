@@ -0,0 +1,129 @@
+# routes/knowledge_point_catalog.py
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from database import db
+from metrics import metrics
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Seconds between checks of the shared generation counter written by other workers
+KP_CATALOG_REFRESH_INTERVAL = float(os.getenv("KP_CATALOG_REFRESH_INTERVAL", "30"))
+GENERATION_ID = "knowledge_points"
+
+def _catalog_entry(p: dict) -> dict:
+    entry = {key: value for key, value in p.items() if key != "_id"}
+    entry["id"] = str(p["id"])
+    return entry
+
+class KnowledgePointCatalog:
+    """
+    Process-local copy of every active knowledge point, indexed by id and by
+    (version, grade, strand, topic, skill). Writers call invalidate(), which bumps a
+    generation counter in Mongo and reloads this worker; other workers notice the new
+    generation on their next periodic check and reload too.
+    """
+    def __init__(self):
+        self._by_id = {}
+        self._by_version = {}
+        self._by_path = {}
+        self._lock = asyncio.Lock()
+        self.generation = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    async def _read_generation(self) -> int:
+        doc = await db.catalog_generations.find_one({"_id": GENERATION_ID})
+        return doc["generation"] if doc else 0
+
+    async def _load(self):
+        generation = await self._read_generation()
+        points = await db.knowledge_points.find({"isActive": True}).to_list(None)
+        by_id, by_version, by_path = {}, {}, {}
+        skipped = 0
+        for p in points:
+            # References are validated by the `id` field only, as the {"id": {"$in": ...}}
+            # lookups did; points created through the API carry just the Mongo _id
+            if not p.get("id"):
+                skipped += 1
+                continue
+            entry = _catalog_entry(p)
+            by_id[entry["id"]] = entry
+            by_version.setdefault(entry.get("version"), []).append(entry)
+            path = (entry.get("version"), entry.get("grade"), entry.get("strand"), entry.get("topic"), entry.get("skill"))
+            by_path.setdefault(path, []).append(entry)
+        # Swap all indexes at once so readers never see a half-built catalog
+        self._by_id, self._by_version, self._by_path = by_id, by_version, by_path
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.reloads += 1
+        logger.info(f"Knowledge point catalog loaded {len(by_id)} points at generation {generation}")
+        if skipped:
+            logger.warning(f"Knowledge point catalog skipped {skipped} active points without an id field")
+
+    async def reload(self):
+        async with self._lock:
+            await self._load()
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            async with self._lock:
+                if not self.loaded:
+                    await self._load()
+
+    async def check_generation(self):
+        """Reload if another worker has changed knowledge points since the last load."""
+        if not self.loaded or await self._read_generation() != self.generation:
+            await self.reload()
+
+    async def invalidate(self):
+        """Call after any knowledge point write: publish a new generation and reload this worker."""
+        await db.catalog_generations.update_one({"_id": GENERATION_ID}, {"$inc": {"generation": 1}}, upsert=True)
+        await self.reload()
+
+    async def run_refresher(self, interval: float = KP_CATALOG_REFRESH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_generation()
+            except Exception as e:
+                logger.error(f"Knowledge point catalog refresh failed: {str(e)}")
+
+    def get(self, kp_id: str):
+        return self._by_id.get(kp_id)
+
+    def get_many(self, ids) -> dict:
+        return {kp_id: self._by_id[kp_id] for kp_id in ids if kp_id in self._by_id}
+
+    async def find_active(self, ids) -> list:
+        """Catalog replacement for find({"id": {"$in": ids}, "isActive": True}).to_list(None)."""
+        await self.ensure_loaded()
+        return list(self.get_many(ids).values())
+
+    def query(self, version: str, grade: str = None, strand: str = None, topic: str = None, skill: str = None) -> list:
+        if grade and strand and topic and skill:
+            return list(self._by_path.get((version, grade, strand, topic, skill), []))
+        filters = {"grade": grade, "strand": strand, "topic": topic, "skill": skill}
+        filters = {key: value for key, value in filters.items() if value}
+        return [p for p in self._by_version.get(version, []) if all(p.get(key) == value for key, value in filters.items())]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._by_id),
+            "versions": len(self._by_version),
+            "generation": self.generation,
+            "reloads": self.reloads,
+            "loadedAt": self.loaded_at,
+        }
+
+knowledge_point_catalog = KnowledgePointCatalog()
+metrics.gauge("knowledge_points.catalog", knowledge_point_catalog.stats)
@@ -1,16 +1,11 @@
 # routes/knowledge_points.py
 from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from bson import ObjectId
-import os
-from dotenv import load_dotenv
 from typing import Optional, List
 from datetime import datetime
 from models.knowledge_point import KnowledgePoint, KnowledgePointResponse
-
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
+from .knowledge_point_catalog import knowledge_point_catalog
 
 router = APIRouter(prefix="/api/knowledge-points", tags=["knowledge_points"])
 
@@ -22,16 +17,8 @@ async def get_knowledge_points(
     skill: Optional[str] = None,
     version: Optional[str] = "2025.01"
 ):
-    query = {"version": version, "isActive": True}
-    if grade:
-        query["grade"] = grade
-    if strand:
-        query["strand"] = strand
-    if topic:
-        query["topic"] = topic
-    if skill:
-        query["skill"] = skill
-    points = await db.knowledge_points.find(query).to_list(None)
+    await knowledge_point_catalog.ensure_loaded()
+    points = knowledge_point_catalog.query(version, grade=grade, strand=strand, topic=topic, skill=skill)
     if not points:
         raise HTTPException(404, "No knowledge points found")
     return [
@@ -58,6 +45,7 @@ async def add_knowledge_point(kp: KnowledgePoint):
     kp_dict["isActive"] = True
     result = await db.knowledge_points.insert_one(kp_dict)
     kp_dict["id"] = str(result.inserted_id)
+    await knowledge_point_catalog.invalidate()
     return kp_dict
 
 @router.put("/{id}", response_model=KnowledgePointResponse)
@@ -75,6 +63,7 @@ async def update_knowledge_point(id: str, kp: KnowledgePoint):
     kp_dict["updatedAt"] = datetime.utcnow().isoformat()
     kp_dict["isActive"] = True
     await db.knowledge_points.update_one({"_id": kp_id}, {"$set": kp_dict})
+    await knowledge_point_catalog.invalidate()
     kp_dict["id"] = id
     return kp_dict
 
@@ -91,4 +80,5 @@ async def delete_knowledge_point(id: str):
     )
     if result.modified_count == 0:
         raise HTTPException(404, "Knowledge point not found or already deleted")
+    await knowledge_point_catalog.invalidate()
     return {"message": "Knowledge point deleted successfully"}
\ No newline at end of file
@@ -23,6 +23,32 @@ def clean_latex_value(latex_str):
     cleaned = cleaned.strip()
     return cleaned if cleaned else latex_str
 
+INLINE_START = '_FLG_LATEX_INLINE_START_'
+INLINE_END = '_FLG_LATEX_INLINE_END_'
+CENTER_START = '_FLG_LATEX_CENTER_START_'
+CENTER_END = '_FLG_LATEX_CENTER_END_'
+_END_MARKERS = {INLINE_START: INLINE_END, CENTER_START: CENTER_END}
+_START_MARKER_RE = re.compile('_FLG_LATEX_(?:INLINE|CENTER)_START_')
+_TEXTBF_RE = re.compile(r'_CMD_LATEX_TEXTBF_START_([^]_CMD_LATEX_TEXTBF_END_]+)_CMD_LATEX_TEXTBF_END_')
+_FRACTION_RE = re.compile(r'_CMD_LATEX_FRACTION_START-([^]_CMD_LATEX_FRACTION_END_]+)_CMD_LATEX_FRACTION_END_([^}-]+)')
+
+def _text_segment(text):
+    text = text.strip()
+    return {"value": text, "type": "text", "original_latex": text}
+
+def restore_latex_commands(value):
+    """Replace the _CMD_LATEX_ / _BACKSLASH_ placeholders in a segment value with their LaTeX commands."""
+    # Every substitution below needs one of these two markers, so most segments skip them all
+    if "_CMD_LATEX_" not in value and "_BACKSLASH_" not in value:
+        return value
+    value = value.replace("_CMD_LATEX_CDOT-", "\\cdot")
+    value = value.replace("_CMD_LATEX_INT-", "\\int")
+    value = value.replace("_CMD_LATEX_SUM-", "\\sum")
+    value = _TEXTBF_RE.sub(r'\\textbf{\1}', value)
+    value = _FRACTION_RE.sub(r'\\frac{\1}{\2}', value)
+    value = value.replace("_BACKSLASH_", "\\")
+    return value.replace("_CMD_LATEX_", "\\")
+
 def parse_mixed_content_with_original(content):
     """
     Parse a string into an array of text and LaTeX segments, using custom markers as delimiters.
@@ -38,83 +64,48 @@ def parse_mixed_content_with_original(content):
     """
     if not content or not isinstance(content, str):
         return [{"value": "", "type": "text", "original_latex": None}]
-    
-    logger.info(f"Debug: Starting parse_mixed_content_with_original with content length {len(content)}")
-    logger.info(f"Debug: Initial content: {content}")
+
+    logger.debug(f"Debug: Starting parse_mixed_content_with_original with content length {len(content)}")
 
     # Preprocess: Check if content is fully enclosed by _FLG_LATEX_INLINE_START_ and _FLG_LATEX_INLINE_END_
-    if (content.startswith('_FLG_LATEX_INLINE_START_') and 
-        content.endswith('_FLG_LATEX_INLINE_END_')):
-        content = '\\(' + content[len('_FLG_LATEX_INLINE_START_'):-len('_FLG_LATEX_INLINE_END_')] + '\\)'
-        logger.info(f"Debug: Replaced _FLG_LATEX_INLINE_START_ and _FLG_LATEX_INLINE_END_ with \\( and \\), new content: {content}")
+    if content.startswith(INLINE_START) and content.endswith(INLINE_END):
+        content = '\\(' + content[len(INLINE_START):-len(INLINE_END)] + '\\)'
 
+    # Jump from start marker to start marker; text between them is sliced out in one piece
     result = []
     current_pos = 0
-    i = 0
-    
-    while i < len(content):
-        # Check for _FLG_LATEX_INLINE_START_ (inline LaTeX)
-        if content.startswith('_FLG_LATEX_INLINE_START_', i):
-            if current_pos < i:
-                result.append({"value": content[current_pos:i].strip(), "type": "text", "original_latex": content[current_pos:i].strip()})
-            start = i
-            i += len('_FLG_LATEX_INLINE_START_')
-            logger.info(f"Debug: Found _FLG_LATEX_INLINE_START_ at position {start}")
-            while i < len(content) and not content.startswith('_FLG_LATEX_INLINE_END_', i):
-                i += 1
-            if i < len(content) and content.startswith('_FLG_LATEX_INLINE_END_', i):
-                logger.info(f"Debug: Found _FLG_LATEX_INLINE_END_ at position {i}")
-                original_latex = content[start:i + len('_FLG_LATEX_INLINE_END_')]
-                inner_content = content[start + len('_FLG_LATEX_INLINE_START_'):i]
-                result.append({"value": '\\(' + inner_content + '\\)', "type": "latex", "original_latex": original_latex})
-                current_pos = i + len('_FLG_LATEX_INLINE_END_')
-                i += len('_FLG_LATEX_INLINE_END_')
-            else:
-                logger.warning(f"Unmatched _FLG_LATEX_INLINE_START_ at position {start}, treating remainder as text")
-                result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
-                break
-                
-        # Check for _FLG_LATEX_CENTER_START_ (centered block LaTeX)
-        elif content.startswith('_FLG_LATEX_CENTER_START_', i):
-            if current_pos < i:
-                result.append({"value": content[current_pos:i].strip(), "type": "text", "original_latex": content[current_pos:i].strip()})
-            start = i
-            i += len('_FLG_LATEX_CENTER_START_')
-            logger.info(f"Debug: Found _FLG_LATEX_CENTER_START_ at position {start}")
-            while i < len(content) and not content.startswith('_FLG_LATEX_CENTER_END_', i):
-                i += 1
-            if i < len(content) and content.startswith('_FLG_LATEX_CENTER_END_', i):
-                logger.info(f"Debug: Found _FLG_LATEX_CENTER_END_ at position {i}")
-                original_latex = content[start:i + len('_FLG_LATEX_CENTER_END_')]
-                inner_content = content[start + len('_FLG_LATEX_CENTER_START_'):i]
-                result.append({"value": '\\(' + inner_content + '\\)', "type": "latex", "original_latex": original_latex})
-                current_pos = i + len('_FLG_LATEX_CENTER_END_')
-                i += len('_FLG_LATEX_CENTER_END_')
-            else:
-                logger.warning(f"Unmatched _FLG_LATEX_CENTER_START_ at position {start}, treating remainder as text")
-                result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
-                break
-        
-        # Check for other text
-        else:
-            i += 1
-    
+    match = _START_MARKER_RE.search(content)
+    while match:
+        start = match.start()
+        start_marker = match.group()
+        end_marker = _END_MARKERS[start_marker]
+        if current_pos < start:
+            result.append(_text_segment(content[current_pos:start]))
+        end = content.find(end_marker, match.end())
+        if end == -1:
+            logger.warning(f"Unmatched {start_marker} at position {start}, treating remainder as text")
+            # The remainder (including any text already emitted above) is appended here and again
+            # below; existing documents were parsed this way, so the output is kept as it was.
+            result.append(_text_segment(content[current_pos:]))
+            break
+        current_pos = end + len(end_marker)
+        result.append({
+            "value": '\\(' + content[match.end():end] + '\\)',
+            "type": "latex",
+            "original_latex": content[start:current_pos],
+        })
+        match = _START_MARKER_RE.search(content, current_pos)
+
     if current_pos < len(content):
-        result.append({"value": content[current_pos:].strip(), "type": "text", "original_latex": content[current_pos:].strip()})
-    
+        result.append(_text_segment(content[current_pos:]))
+
     # Post-process: Replace all _CMD_LATEX_ markers with their original LaTeX values
     for segment in result:
-        segment["value"] = segment["value"].replace("_CMD_LATEX_CDOT-", "\\cdot")
-        segment["value"] = segment["value"].replace("_CMD_LATEX_INT-", "\\int")
-        segment["value"] = segment["value"].replace("_CMD_LATEX_SUM-", "\\sum")
-        segment["value"] = re.sub(r'_CMD_LATEX_TEXTBF_START_([^]_CMD_LATEX_TEXTBF_END_]+)_CMD_LATEX_TEXTBF_END_', r'\\textbf{\1}', segment["value"])
-        segment["value"] = re.sub(r'_CMD_LATEX_FRACTION_START-([^]_CMD_LATEX_FRACTION_END_]+)_CMD_LATEX_FRACTION_END_([^}-]+)', r'\\frac{\1}{\2}', segment["value"])
-        segment["value"] = segment["value"].replace("_BACKSLASH_", "\\")
-        segment["value"] = segment["value"].replace("_CMD_LATEX_", "\\")
-
-    # Logger results for debugging
-    for idx, segment in enumerate(result):
-        logger.info(f"Segment {idx}: value='{segment['value']}', type='{segment['type']}', original_latex='{segment['original_latex']}'")
+        segment["value"] = restore_latex_commands(segment["value"])
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for idx, segment in enumerate(result):
+            logger.debug(f"Segment {idx}: value='{segment['value']}', type='{segment['type']}', original_latex='{segment['original_latex']}'")
 
     return result
 
@@ -1,12 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
+from database import db
 
 router = APIRouter(prefix="/api/managers", tags=["managers"])
 
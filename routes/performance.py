@@ -1,13 +1,7 @@
 # routes/performance.py
 from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from .auth import get_current_user
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
 
 router = APIRouter(prefix="/api/performance", tags=["performance"])
 
@@ -1,10 +1,16 @@
 # routes/question_generator.py
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from routes.auth import get_current_user
+from metrics import metrics
 import logging
-from routes.grok_math_handler import process_math_question
+from routes.grok_math_handler import process_math_question, stream_math_question
+from routes.question_pool import question_pool
 import base64
+import httpx
+import json
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,12 +24,71 @@ class GenerateQuestionRequest(BaseModel):
     save_to_db: bool = False  # Option to save to MongoDB
     ai_provider: str = None  # New field to switch between providers, default to grok
 
-@router.post("/", response_model=dict)  # Matches the dictionary structure
-async def generate_question(request: GenerateQuestionRequest, current_user: dict = Depends(get_current_user)):
+# Owner recorded on questions generated ahead of time for the pool
+POOL_USER = {"id": "question-pool"}
+
+async def generate_live_question(request: GenerateQuestionRequest, current_user: dict):
     if request.ai_provider == "grok":
         return await process_math_question(request)  # Await the coroutine
     elif request.ai_provider == "openai":
         from routes.question_generator_openai import generate_question_openai
         return await generate_question_openai(request, current_user)
     else:
-        raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {request.ai_provider}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {request.ai_provider}")
+
+async def generate_pool_question(difficulty: str, topic: str, provider: str) -> dict:
+    """Generator for question_pool.run_refiller: the same live path, never saved to questions."""
+    request = GenerateQuestionRequest(difficulty=difficulty, topic=topic, ai_provider=provider)
+    return await generate_live_question(request, POOL_USER)
+
+@router.post("/", response_model=dict)  # Matches the dictionary structure
+async def generate_question(request: GenerateQuestionRequest, current_user: dict = Depends(get_current_user)):
+    # Saved questions need the requester as owner, so only unsaved ones come from the pool
+    if not request.save_to_db:
+        pooled = await question_pool.pop(request.difficulty, request.topic, request.ai_provider)
+        if pooled is not None:
+            return pooled
+    started = time.perf_counter()
+    result = await generate_live_question(request, current_user)
+    metrics.observe("generate_question.live_ms", (time.perf_counter() - started) * 1000)
+    return result
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _question_events(request: GenerateQuestionRequest):
+    started = time.perf_counter()
+    result = {"question": [], "correctAnswer": []}
+    try:
+        async for field, segment in stream_math_question(request):
+            if not result["question"] and not result["correctAnswer"]:
+                metrics.observe("generate_question.stream.first_segment_ms", (time.perf_counter() - started) * 1000)
+            result[field].append(segment)
+            yield _sse("segment", {"field": field, "index": len(result[field]) - 1, "segment": segment})
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Grok streaming error: {str(e)}")
+        metrics.inc("generate_question.stream.errors")
+        yield _sse("error", {"status": e.response.status_code, "detail": f"Grok API request failed: {str(e)}"})
+        return
+    except Exception as e:
+        logger.error(f"Grok streaming error: {str(e)}")
+        metrics.inc("generate_question.stream.errors")
+        yield _sse("error", {"status": 500, "detail": f"Unexpected error streaming question: {str(e)}"})
+        return
+    metrics.observe("generate_question.stream.total_ms", (time.perf_counter() - started) * 1000)
+    yield _sse("done", result)
+
+@router.post("/stream")
+async def generate_question_stream(request: GenerateQuestionRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Server-Sent Events variant of POST /api/generate-question/ for the grok provider.
+    Emits `segment` events ({field, index, segment}) as each segment of the completion
+    closes, then `done` with the full result, or `error` if generation fails midway.
+    """
+    if request.ai_provider != "grok":
+        raise HTTPException(status_code=400, detail=f"Streaming is not supported for AI provider: {request.ai_provider}")
+    return StreamingResponse(
+        _question_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
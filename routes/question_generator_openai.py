@@ -1,10 +1,12 @@
 # routes/question_generator_openai.py
-import openai
+import asyncio
+import httpx
+import llm_clients
 import os
 from fastapi import HTTPException
-from .latex_parser import parse_json_content  # Relative import with package notation
+from routes.grok_math_handler import build_math_question_prompt, parse_math_question
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import db
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
@@ -16,50 +18,39 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
+# Upper bound on one whole generation; the shared client's timeouts only bound each read
+OPENAI_GENERATION_TIMEOUT = float(os.getenv("OPENAI_GENERATION_TIMEOUT", "90"))
+
+async def call_openai_api(prompt):
+    """Chat completion over the shared OpenAI client; returns the message content."""
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}", "Content-Type": "application/json"}
+    payload = {"model": "gpt-4", "messages": [{"role": "user", "content": prompt}], "max_tokens": 2000, "temperature": 0.7}
+    client = llm_clients.get_client("openai")
+    response = await client.post(llm_clients.CHAT_COMPLETIONS_PATH, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
 
 async def generate_question_openai(request, current_user):
     try:
         # Log request details
         logger.info(f"Generating question with criteria: {request.dict()}")
 
-        # Prepare prompt for OpenAI
+        # Same prompt and segment format as the Grok provider, plus the topic
         topics = ["algebra", "geometry", "calculus"]
         selected_topic = request.topic if request.topic in topics else random.choice(topics)
-        prompt = (
-            f"Generate a complex math question with multiple paragraphs, including multiple equations and various complex math expressions "
-            f"(e.g., fractions, exponents, integrals, matrices), with the following requirements: "
-            f"difficulty level {request.difficulty}, topic {selected_topic}, "
-            f"format the question and correct answer in LaTeX. "
-            f"Return a JSON object with 'question' and 'correctAnswer' fields. "
-            f"The 'question' should include at least two paragraphs with diverse mathematical content, and the 'correctAnswer' should be a separate field "
-            f"containing only the solution in the format '$x=value,y=value$' (e.g., '$x=3,y=1$'). Do not include the correct answer within the question text itself. "
-            f"Ensure the answer is mathematically accurate and suitable for a student at this level."
-        )
-        logger.info(f"Prompt sent to OpenAI API: {prompt}")
+        prompt = f"{build_math_question_prompt(request)} The question should be about {selected_topic}."
 
-        # API call to OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        if not openai.api_key:
+        if not os.getenv("OPENAI_API_KEY"):
             logger.error("OpenAI API key not configured")
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
 
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.7
-        )
-
-        logger.info(f"OpenAI API response: {response}")
-        raw_content = response.choices[0].message.content
+        # Awaiting the completion leaves the event loop free for other requests; wait_for
+        # cancels the request (returning its connection to the pool) when the deadline passes
+        raw_content = await asyncio.wait_for(call_openai_api(prompt), OPENAI_GENERATION_TIMEOUT)
         logger.info(f"Raw content from OpenAI: {raw_content}")
 
-        # Parse the raw content using latex_parser
-        parsed_result = parse_json_content(raw_content)
-        parsed_data = json.loads(parsed_result)
-        logger.info(f"Parsed OpenAI response: {parsed_result}")
+        parsed_data = parse_math_question(raw_content)
+        logger.info(f"Parsed OpenAI response: {parsed_data}")
 
         # Prepare question data for potential MongoDB save
         question_data = {
@@ -99,9 +90,20 @@ async def generate_question_openai(request, current_user):
         logger.info(f"Returning response from OpenAI: {response_dict}")
         return response_dict
 
-    except openai.error.OpenAIError as e:
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        logger.error(f"OpenAI generation exceeded {OPENAI_GENERATION_TIMEOUT} s")
+        raise HTTPException(status_code=504, detail="OpenAI API request timed out")
+    except httpx.HTTPStatusError as e:
         logger.error(f"OpenAI API error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+        raise HTTPException(status_code=e.response.status_code, detail=f"OpenAI API request failed: {str(e)}")
+    except httpx.RequestError as e:
+        logger.error(f"OpenAI API request error: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"OpenAI API request error: {str(e)}")
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to decode OpenAI response: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating question: {str(e)}")
\ No newline at end of file
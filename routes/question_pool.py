@@ -0,0 +1,157 @@
+# routes/question_pool.py
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db
+from metrics import metrics
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Refilling costs one LLM call per question, so the pool is opt-in
+QUESTION_POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "false").lower() in ("1", "true", "yes")
+# difficulty:topic:provider entries to keep stocked; an empty topic serves requests without one
+QUESTION_POOL_KEYS = os.getenv("QUESTION_POOL_KEYS", "easy::grok,medium::grok,hard::grok")
+# Questions kept ready per key, and how many generations may run at once while refilling
+QUESTION_POOL_TARGET = int(os.getenv("QUESTION_POOL_TARGET", "5"))
+QUESTION_POOL_REFILL_CONCURRENCY = int(os.getenv("QUESTION_POOL_REFILL_CONCURRENCY", "2"))
+# Seconds between refill passes when nothing has been taken from the pool
+QUESTION_POOL_REFILL_INTERVAL = float(os.getenv("QUESTION_POOL_REFILL_INTERVAL", "30"))
+LEASE_ID = "question_pool_refiller"
+RATE_WINDOW = 600  # seconds of refills counted in ratePerMinute
+
+def parse_keys(spec: str) -> list:
+    keys = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        difficulty, topic, provider = (part.strip() for part in entry.split(":"))
+        keys.append((difficulty, topic or None, provider))
+    return keys
+
+class QuestionPool:
+    """
+    Buffer of already generated and parsed questions per (difficulty, topic, provider),
+    kept in the question_pool collection so every worker serves from the same stock.
+    pop() takes the oldest entry with one find_one_and_delete; one worker at a time
+    (holding a lease in question_pool_leases) tops each key back up to `target`.
+    """
+    def __init__(self, keys: list, target: int = QUESTION_POOL_TARGET, concurrency: int = QUESTION_POOL_REFILL_CONCURRENCY):
+        self.keys = keys
+        self.target = target
+        self.concurrency = concurrency
+        self.owner = str(uuid.uuid4())
+        self.depth = {key: None for key in keys}
+        self.counted_at = None
+        self._refilled_at = deque()
+        self._wake = asyncio.Event()
+
+    @staticmethod
+    def _filter(key: tuple) -> dict:
+        difficulty, topic, provider = key
+        return {"difficulty": difficulty, "topic": topic, "provider": provider}
+
+    async def pop(self, difficulty: str, topic: str, provider: str):
+        """The oldest pooled question for this key, removed from the pool; None if there is none."""
+        key = (difficulty, topic or None, provider)
+        if not QUESTION_POOL_ENABLED or key not in self.depth:
+            return None
+        doc = await db.question_pool.find_one_and_delete(self._filter(key), sort=[("createdAt", 1)])
+        # Let this worker's refiller top the key up without waiting for the next interval
+        self._wake.set()
+        if doc is None:
+            metrics.inc("question_pool.misses")
+            self.depth[key] = 0
+            return None
+        metrics.inc("question_pool.hits")
+        if self.depth[key]:
+            self.depth[key] -= 1
+        return doc["result"]
+
+    async def _acquire_lease(self, seconds: float) -> bool:
+        now = datetime.utcnow()
+        try:
+            await db.question_pool_leases.find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"owner": self.owner}, {"expiresAt": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expiresAt": now + timedelta(seconds=seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return True
+        except DuplicateKeyError:
+            # Another worker holds an unexpired lease, so the upsert collided with its document
+            return False
+
+    async def _generate_one(self, key: tuple, generate, semaphore: asyncio.Semaphore, lease_seconds: float) -> bool:
+        async with semaphore:
+            # Renew the lease per generation so a long pass is not taken over and duplicated
+            if lease_seconds and not await self._acquire_lease(lease_seconds):
+                return False
+            started = time.perf_counter()
+            try:
+                result = await generate(*key)
+            except Exception as e:
+                logger.error(f"Question pool generation failed for {key}: {getattr(e, 'detail', str(e))}")
+                metrics.inc("question_pool.refill_errors")
+                return False
+            await db.question_pool.insert_one({**self._filter(key), "result": result, "createdAt": datetime.utcnow()})
+            metrics.observe("question_pool.refill_ms", (time.perf_counter() - started) * 1000)
+            metrics.inc("question_pool.refilled")
+            self._refilled_at.append(time.time())
+            return True
+
+    async def refill(self, generate, lease_seconds: float = None) -> int:
+        """Count every key and generate its shortfall. Returns the number of questions added."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        for key in self.keys:
+            depth = await db.question_pool.count_documents(self._filter(key))
+            self.depth[key] = depth
+            tasks.extend(self._generate_one(key, generate, semaphore, lease_seconds) for _ in range(self.target - depth))
+        self.counted_at = time.time()
+        added = sum(await asyncio.gather(*tasks))
+        if added:
+            for key in self.keys:
+                self.depth[key] = await db.question_pool.count_documents(self._filter(key))
+            logger.info(f"Question pool refilled with {added} questions: {self.stats()['depth']}")
+        return added
+
+    async def run_refiller(self, generate, interval: float = QUESTION_POOL_REFILL_INTERVAL):
+        """Refill loop for the lifespan. `generate(difficulty, topic, provider)` returns one parsed question."""
+        while True:
+            try:
+                lease_seconds = interval * 4
+                if await self._acquire_lease(lease_seconds):
+                    await self.refill(generate, lease_seconds)
+            except Exception as e:
+                logger.error(f"Question pool refill failed: {str(e)}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        cutoff = time.time() - RATE_WINDOW
+        while self._refilled_at and self._refilled_at[0] < cutoff:
+            self._refilled_at.popleft()
+        return {
+            "enabled": QUESTION_POOL_ENABLED,
+            "target": self.target,
+            # As of this worker's last refill pass, adjusted by its own pops
+            "depth": {":".join(part or "" for part in key): depth for key, depth in self.depth.items()},
+            "countedAt": self.counted_at,
+            "refillRatePerMinute": round(len(self._refilled_at) * 60 / RATE_WINDOW, 2),
+        }
+
+question_pool = QuestionPool(parse_keys(QUESTION_POOL_KEYS))
+metrics.gauge("question_pool", question_pool.stats)
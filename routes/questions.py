@@ -1,12 +1,21 @@
 # routes/questions.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+from pymongo import UpdateOne
+from database import db
+from metrics import metrics
+from .knowledge_point_catalog import knowledge_point_catalog
+from .latex_parser import parse_mixed_content_with_original
+from .answer_verification import correct_answer_pairs
+from .verify_answer import answer_verifier
 from typing import List, Optional
 from datetime import datetime
+import base64
+import json
 import uuid
+import zlib
 
 import logging
 
@@ -15,12 +24,17 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
-
 router = APIRouter(prefix="/api/questions", tags=["questions"])
 
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+# Keyset order for listing; backed by the partial (isActive, createdAt, id) index in indexes.py
+QUESTION_SORT = [("createdAt", 1), ("id", 1)]
+QUESTION_LIST_FIELDS = [
+    "id", "title", "question", "category", "difficulty", "knowledgePoints",
+    "correctAnswer", "passValidation", "createdAt", "updatedAt", "isActive"
+]
+
 # Define segment model
 class Segment(BaseModel):
     value: str
@@ -74,6 +88,146 @@ class QuestionResponse(BaseModel):
     isActive: bool
 
 
+def _knowledge_point_summary(p):
+    return {
+        "id": p["id"],
+        "grade": p["grade"],
+        "strand": p["strand"],
+        "topic": p["topic"],
+        "skill": p["skill"],
+        "subKnowledgePoint": p["subKnowledgePoint"]
+    }
+
+def _knowledge_point_ids(question):
+    # Older documents stored the ids under knowledgePoints instead of knowledgePointIds
+    ids = question.get("knowledgePointIds")
+    if ids is None:
+        ids = question.get("knowledgePoints")
+    return [kp_id for kp_id in dict.fromkeys(ids or []) if isinstance(kp_id, str)]
+
+async def fetch_knowledge_points(ids) -> dict:
+    """Look up active knowledge points in the in-memory catalog; returns id -> summary."""
+    await knowledge_point_catalog.ensure_loaded()
+    points = knowledge_point_catalog.get_many(dict.fromkeys(ids))
+    return {kp_id: _knowledge_point_summary(p) for kp_id, p in points.items()}
+
+def attach_knowledge_points(questions: list, points: dict) -> list:
+    for question in questions:
+        question["knowledgePoints"] = [points[kp_id] for kp_id in _knowledge_point_ids(question) if kp_id in points]
+    return questions
+
+async def hydrate_knowledge_points(questions: list) -> list:
+    """Expand knowledge point ids into knowledgePoints for a whole batch of questions without touching Mongo."""
+    points = await fetch_knowledge_points(kp_id for question in questions for kp_id in _knowledge_point_ids(question))
+    return attach_knowledge_points(questions, points)
+
+def normalize_legacy_fields(question: dict) -> dict:
+    """
+    Return the segment-array form of any field still stored in the legacy string form
+    (`question` as marked-up text, `correctAnswer` as a comma-separated list); empty when
+    the document is already normalized.
+    """
+    upgrades = {}
+    # Ensure question is a list of segments if it was stored as a string
+    if isinstance(question.get("question"), str):
+        upgrades["question"] = parse_mixed_content_with_original(question["question"])
+    # Ensure correctAnswer is a list of segments if it was stored as a string
+    if isinstance(question.get("correctAnswer"), str):
+        upgrades["correctAnswer"] = [
+            {"value": seg.strip(), "type": "latex", "original_latex": seg.strip()}
+            for seg in question["correctAnswer"].split(",")
+        ]
+    return upgrades
+
+def apply_read_defaults(question: dict) -> dict:
+    # Provide default values for optional fields if missing
+    question["correctAnswer"] = question.get("correctAnswer", [])
+    question["passValidation"] = question.get("passValidation", False)
+    question.update(normalize_legacy_fields(question))
+    return question
+
+async def apply_read_defaults_and_upgrade(questions: list) -> list:
+    """
+    apply_read_defaults() for a batch of read documents. Legacy string-form fields are
+    written back in their normalized form with one bulk write, so each document is parsed
+    at most once; `python -m migrations.normalize_questions` converts the rest up front.
+    """
+    upgrades = []
+    for question in questions:
+        fields = normalize_legacy_fields(question)
+        if fields and question.get("id"):
+            # Only overwrite fields that are still strings, in case the document changed since the read
+            guard = {field: {"$type": "string"} for field in fields}
+            upgrades.append(UpdateOne({"id": question["id"], **guard}, {"$set": fields}))
+        question.update(fields)
+        apply_read_defaults(question)
+    if upgrades:
+        try:
+            result = await db.questions.bulk_write(upgrades, ordered=False)
+            metrics.inc("questions.legacy_upgraded_on_read", result.modified_count)
+            logger.info(f"Normalized {result.modified_count} legacy questions on read")
+        except Exception as e:
+            # The response is already normalized; the next read retries the write-back
+            logger.error(f"Failed to write back normalized questions: {str(e)}")
+    return questions
+
+async def compile_canonical_answer(correct_answer: list):
+    """Canonical form of the correct answer for /api/verify-answer/by-question, or None if it cannot be compiled now."""
+    try:
+        return await answer_verifier.compile(correct_answer_pairs(correct_answer))
+    except Exception as e:
+        # verify-answer/by-question compiles it on first use instead
+        logger.warning(f"Could not compile canonical answer: {type(e).__name__} {str(e)}")
+        return None
+
+def encode_cursor(question: dict) -> str:
+    raw = json.dumps([question.get("createdAt"), question.get("id")])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> dict:
+    """Turn an opaque cursor into the keyset condition for rows after (createdAt, id)."""
+    try:
+        created_at, question_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+    return {"$or": [
+        {"createdAt": {"$gt": created_at}},
+        {"createdAt": created_at, "id": {"$gt": question_id}}
+    ]}
+
+def _question_filter(difficulty, category, knowledgePointIds, passValidation) -> dict:
+    query = {"isActive": True}
+    if difficulty:
+        query["difficulty"] = difficulty
+    if category:
+        query["category"] = category
+    if knowledgePointIds:
+        query["knowledgePointIds"] = {"$in": knowledgePointIds}
+    if passValidation is not None:
+        # Documents without the flag are reported as passValidation=False
+        query["passValidation"] = True if passValidation else {"$ne": True}
+    return query
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(selected) - set(QUESTION_LIST_FIELDS)
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(QUESTION_LIST_FIELDS)}")
+    return list(dict.fromkeys(["id", *selected]))
+
+def _question_projection(selected: Optional[list]):
+    if selected is None:
+        return None
+    projection = {"_id": 0, "id": 1, "createdAt": 1}  # the keyset fields are always needed for the cursor
+    for field in selected:
+        if field == "knowledgePoints":
+            projection["knowledgePointIds"] = 1
+        projection[field] = 1
+    return projection
+
+
 @router.post("/", response_model=QuestionResponse)
 async def add_question(question: Question):
     # Temporarily disable validation for empty question list
@@ -83,14 +237,12 @@ async def add_question(question: Question):
     logger.info(f"question:{question}")
 
     # Validate knowledge point IDs
-    valid_points = await db.knowledge_points.find(
-        {"id": {"$in": question.knowledgePointIds}, "isActive": True}
-    ).to_list(None)
+    valid_points = await fetch_knowledge_points(question.knowledgePointIds)
     if len(valid_points) != len(question.knowledgePointIds):
         raise HTTPException(400, "Some knowledge point IDs are invalid or inactive")
 
     # log valid_points content
-    logger.info(f"Valid knowledge points: {valid_points}")
+    logger.info(f"Valid knowledge points: {list(valid_points)}")
 
     question_dict = question.dict(exclude={"id"})
     question_dict["content"] = question.content
@@ -102,7 +254,7 @@ async def add_question(question: Question):
 
     # log question.question content
     logger.info(f"Question content: {question.question}")   
-    logger.info(f"question_dict question: {question_dict["question"]}")   
+    logger.info(f"question_dict question: {question_dict['question']}")   
     
     # if question_dict["question"] is not None and first segment is a newline, remove it
     if question_dict["question"] and question_dict["question"][0].get("type") == "newline":
@@ -115,87 +267,123 @@ async def add_question(question: Question):
     #else:
     #    question_dict["question"] = question.question   
 
+    canonical = await compile_canonical_answer(question_dict["correctAnswer"])
+    if canonical:
+        question_dict["canonicalAnswer"] = canonical
+
     await db.questions.insert_one(question_dict)
-    question_dict["knowledgePoints"] = [
-        {
-            "id": p["id"],
-            "grade": p["grade"],
-            "strand": p["strand"],
-            "topic": p["topic"],
-            "skill": p["skill"],
-            "subKnowledgePoint": p["subKnowledgePoint"]
-        }
-        for p in valid_points
-    ]
+    attach_knowledge_points([question_dict], valid_points)
     return question_dict
 
 @router.get("/", response_model=List[QuestionResponse])
-async def get_questions():
-    questions = await db.questions.find({"isActive": True}).to_list(None)
-    for question in questions:
-        logger.info(f"Processing question: {question}")
-        question["knowledgePointIds"] = await db.knowledge_points.find(
-            {"id": {"$in": question["knowledgePointIds"]}, "isActive": True}
-        ).to_list(None)
-        question["knowledgePoints"] = [
-            {
-                "id": p["id"],
-                "grade": p["grade"],
-                "strand": p["strand"],
-                "topic": p["topic"],
-                "skill": p["skill"],
-                "subKnowledgePoint": p["subKnowledgePoint"]
-            }
-            for p in question["knowledgePointIds"]
-        ]
-        # Provide default values for optional fields if missing
-        question["correctAnswer"] = question.get("correctAnswer", [])
-        question["passValidation"] = question.get("passValidation", False)
-        # Ensure question is a list of segments if it was stored as a string
-        if isinstance(question.get("question"), str):
-            from latex_parser import parse_mixed_content_with_original
-            question["question"] = parse_mixed_content_with_original(question["question"])
-        # Ensure correctAnswer is a list of segments if it was stored as a string
-        if isinstance(question.get("correctAnswer"), str):
-            question["correctAnswer"] = [
-                {"value": seg.strip(), "type": "latex", "original_latex": seg.strip()}
-                for seg in question["correctAnswer"].split(",")
-            ]
+async def get_questions(
+    response: Response,
+    difficulty: Optional[str] = None,
+    category: Optional[str] = None,
+    knowledgePointIds: Optional[List[str]] = Query(None),
+    passValidation: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    List active questions in (createdAt, id) order. With `limit`, one page is returned and
+    the X-Next-Cursor header carries the cursor for the next page (absent on the last page).
+    `fields` is a comma-separated projection, e.g. `fields=title,difficulty`; `id` is always included.
+    """
+    selected = _parse_fields(fields)
+    query = _question_filter(difficulty, category, knowledgePointIds, passValidation)
+    if cursor:
+        query.update(_decode_cursor(cursor))
+    find = db.questions.find(query, _question_projection(selected)).sort(QUESTION_SORT)
+    if limit:
+        find = find.limit(limit + 1)
+    questions = await find.to_list(None)
+
+    next_cursor = None
+    if limit and len(questions) > limit:
+        questions = questions[:limit]
+        next_cursor = encode_cursor(questions[-1])
+
+    if selected is None or "knowledgePoints" in selected:
+        await hydrate_knowledge_points(questions)
+    await apply_read_defaults_and_upgrade(questions)
+
+    if selected is not None:
+        # Projected rows are partial documents, so they bypass the QuestionResponse model
+        projected = JSONResponse(jsonable_encoder([{field: q.get(field) for field in selected} for q in questions]))
+        if next_cursor:
+            projected.headers["X-Next-Cursor"] = next_cursor
+        return projected
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return questions
 
+async def _export_batch(batch: list, selected: list) -> str:
+    if "knowledgePoints" in selected:
+        await hydrate_knowledge_points(batch)
+    await apply_read_defaults_and_upgrade(batch)
+    lines = []
+    for question in batch:
+        lines.append(json.dumps({field: question.get(field) for field in selected}, default=str))
+    return "\n".join(lines) + "\n"
+
+async def _export_lines(query: dict, selected: list, batch_size: int):
+    """Walk the cursor in batches, hydrating knowledge points once per batch; memory stays at one batch."""
+    projection = _question_projection(selected)
+    cursor = db.questions.find(query, projection).sort(QUESTION_SORT).batch_size(batch_size)
+    batch = []
+    async for question in cursor:
+        batch.append(question)
+        if len(batch) >= batch_size:
+            yield await _export_batch(batch, selected)
+            batch = []
+    if batch:
+        yield await _export_batch(batch, selected)
+
+async def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        # Sync-flush per batch so consumers can decode rows as they arrive
+        yield compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+@router.get("/export")
+async def export_questions(
+    request: Request,
+    difficulty: Optional[str] = None,
+    category: Optional[str] = None,
+    knowledgePointIds: Optional[List[str]] = Query(None),
+    passValidation: Optional[bool] = None,
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=5000),
+):
+    """
+    Stream the active question bank as NDJSON, one question per line, in (createdAt, id) order.
+    Accepts the same filters and `fields` projection as the list endpoint. Sent gzip-encoded
+    when the client accepts it.
+    """
+    selected = _parse_fields(fields) or QUESTION_LIST_FIELDS
+    query = _question_filter(difficulty, category, knowledgePointIds, passValidation)
+    lines = _export_lines(query, selected, batch_size)
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        return StreamingResponse(
+            _gzip_stream(lines),
+            media_type="application/x-ndjson",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
 @router.get("/{id}/", response_model=QuestionResponse)
 async def get_question_by_id(id: str):
     try:
         question = await db.questions.find_one({"id": id, "isActive": True})
         if not question:
             raise HTTPException(status_code=404, detail="Question not found")
-        question["knowledgePoints"] = await db.knowledge_points.find(
-            {"id": {"$in": question["knowledgePoints"]}, "isActive": True}
-        ).to_list(None)
-        question["knowledgePoints"] = [
-            {
-                "id": p["id"],
-                "grade": p["grade"],
-                "strand": p["strand"],
-                "topic": p["topic"],
-                "skill": p["skill"],
-                "subKnowledgePoint": p["subKnowledgePoint"]
-            }
-            for p in question["knowledgePoints"]
-        ]
-        # Provide default values for optional fields if missing
-        question["correctAnswer"] = question.get("correctAnswer", [])
-        question["passValidation"] = question.get("passValidation", False)
-        # Ensure question is a list of segments if it was stored as a string
-        if isinstance(question.get("question"), str):
-            from latex_parser import parse_mixed_content_with_original
-            question["question"] = parse_mixed_content_with_original(question["question"])
-        # Ensure correctAnswer is a list of segments if it was stored as a string
-        if isinstance(question.get("correctAnswer"), str):
-            question["correctAnswer"] = [
-                {"value": seg.strip(), "type": "latex", "original_latex": seg.strip()}
-                for seg in question["correctAnswer"].split(",")
-            ]
+        await hydrate_knowledge_points([question])
+        await apply_read_defaults_and_upgrade([question])
         return question
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching question: {str(e)}")
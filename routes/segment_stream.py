@@ -0,0 +1,80 @@
+# routes/segment_stream.py
+import json
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SegmentStreamParser:
+    """
+    Incremental parser for a model response of the form
+    {"question": [{"type": ..., "value": ...}, ...], "correctAnswer": [...]}, fed as it streams in.
+    feed() takes the next chunk of text and returns (field, segment) for every array element
+    whose closing brace has arrived, so segments can be shown before the response is complete.
+    Text outside the top-level object (e.g. a ```json fence) is ignored.
+    """
+    def __init__(self):
+        self._stack = []  # open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._key = None  # characters of a string being read at the top level
+        self._last_string = None
+        self._field = None
+        self._element = None  # pieces of the array element being read
+        self.segments = 0
+
+    def _in_field_array(self) -> bool:
+        return len(self._stack) == 2 and self._stack[1] == "["
+
+    def _finish_element(self):
+        text = "".join(self._element)
+        self._element = None
+        try:
+            segment = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed segment in {self._field}: {str(e)}")
+            return None
+        if not isinstance(segment, dict):
+            return None
+        self.segments += 1
+        return self._field, segment
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        element_from = 0 if self._element is not None else None
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key is not None:
+                        self._last_string = "".join(self._key)
+                        self._key = None
+                elif self._key is not None:
+                    self._key.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._key = [] if len(self._stack) == 1 else None
+            elif ch == ":" and len(self._stack) == 1:
+                self._field = self._last_string
+            elif ch == "{" or ch == "[":
+                if ch == "{" and self._in_field_array() and self._element is None:
+                    self._element = []
+                    element_from = i
+                self._stack.append(ch)
+            elif (ch == "}" or ch == "]") and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._element is not None and self._in_field_array():
+                    self._element.append(chunk[element_from:i + 1])
+                    element_from = None
+                    event = self._finish_element()
+                    if event:
+                        events.append(event)
+        if self._element is not None and element_from is not None:
+            self._element.append(chunk[element_from:])
+        return events
@@ -1,16 +1,10 @@
 # routes/students.py
 from fastapi import APIRouter, HTTPException
 from models.student import Student
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+from database import db
 from datetime import datetime
 from collections import defaultdict
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
-
 router = APIRouter(prefix="/api/students", tags=["students"])
 
 @router.get("/")
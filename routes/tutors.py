@@ -1,15 +1,9 @@
 # routes/tutors.py
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+from database import db
 from .auth import get_current_user
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
-
 router = APIRouter(prefix="/api/tutors", tags=["tutors"])
 
 class AssignStudentsRequest(BaseModel):
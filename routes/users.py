@@ -1,11 +1,9 @@
 # routes/users.py
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-from bcrypt import hashpw, gensalt
-import os
-from dotenv import load_dotenv
-from .auth import get_current_user
+from database import db
+from .auth import get_current_user, invalidate_principals
+from .password_hashing import password_hasher, PasswordHasherBusy
 import logging
 from pymongo.errors import DuplicateKeyError
 from typing import Optional, List
@@ -14,10 +12,6 @@ from typing import Optional, List
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-db = client["math_edu_db"]
-
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 class UserCreate(BaseModel):
@@ -176,10 +170,15 @@ async def add_user(user: UserCreate, current_user: dict = Depends(get_current_us
         await validate_user_ids(user.studentIds, "student", "studentIds")
     
     try:
-        hashed_password = hashpw(user.password.encode("utf-8"), gensalt()).decode("utf-8")
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Password hashing busy, please retry", headers={"Retry-After": "1"})
+    
+    try:
         user_dict = user.dict()
         user_dict["password"] = hashed_password
         user_dict["performanceData"] = {"totalCorrect": 0, "totalAttempts": 0, "avgTimeTaken": 0.0}
+        user_dict["tokenVersion"] = 0
         await db.users.insert_one(user_dict)
         
         if user.role == "student" and user.tutorId:
@@ -242,9 +241,14 @@ async def update_user(user_id: str, update_data: UserUpdate, current_user: dict
     update_dict.setdefault("email", existing_user["email"])
     update_dict.setdefault("role", existing_user["role"])
     
+    update_ops = {"$set": update_dict}
+    # Role, email or status changes revoke outstanding refresh tokens
+    if any(field in update_dict and update_dict[field] != existing_user.get(field) for field in ("role", "email", "disabled")):
+        update_ops["$inc"] = {"tokenVersion": 1}
+    
     result = await db.users.update_one(
         {"id": user_id, "disabled": False},
-        {"$set": update_dict}
+        update_ops
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found or no changes made")
@@ -278,6 +282,7 @@ async def update_user(user_id: str, update_data: UserUpdate, current_user: dict
                 {"$addToSet": {"parentIds": user_id}}
             )
     
+    invalidate_principals(user_id)
     return {"message": "User updated"}
 
 @router.post("/assign-parent")
@@ -313,6 +318,7 @@ async def assign_parent(assignment: AssignParent, current_user: dict = Depends(g
             {"$addToSet": {"studentIds": assignment.studentId}}
         )
     
+    invalidate_principals(assignment.studentId, *current_parent_ids, *new_parent_ids)
     return {"message": "Parent assigned successfully"}
 
 @router.post("/assign-student")
@@ -348,6 +354,7 @@ async def assign_student(assignment: AssignStudent, current_user: dict = Depends
             {"$addToSet": {"parentIds": assignment.parentId}}
         )
     
+    invalidate_principals(assignment.parentId, *current_student_ids, *new_student_ids)
     return {"message": "Student assigned successfully"}
 
 @router.post("/assign-tutor-students")
@@ -383,6 +390,7 @@ async def assign_tutor_students(assignment: AssignTutorStudents, current_user: d
             {"$set": {"tutorId": assignment.tutorId}}
         )
     
+    invalidate_principals(assignment.tutorId, *current_student_ids, *new_student_ids)
     return {"message": "Students assigned successfully"}
 
 @router.delete("/{user_id}")
@@ -413,11 +421,29 @@ async def soft_delete_user(user_id: str, current_user: dict = Depends(get_curren
                 {"$pull": {"parentIds": user_id}}
             )
     
+    # Only an enabled user is disabled (and has its tokens revoked); $inc alone would always modify
     result = await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"disabled": True}}
+        {"id": user_id, "disabled": {"$ne": True}},
+        {"$set": {"disabled": True}, "$inc": {"tokenVersion": 1}}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found or no changes made")
+    invalidate_principals(user_id)
+    
+    return {"message": "User soft deleted"}
+
+@router.post("/{user_id}/revoke-tokens")
+async def revoke_user_tokens(user_id: str, current_user: dict = Depends(get_current_user)):
+    logger.info(f"Revoking tokens for user {user_id}, current_user: {current_user['id']}")
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can revoke tokens")
+    
+    result = await db.users.update_one(
+        {"id": user_id},
+        {"$inc": {"tokenVersion": 1}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    return {"message": "User soft deleted"}
\ No newline at end of file
+    invalidate_principals(user_id)
+    return {"message": "User tokens revoked"}
@@ -1,10 +1,34 @@
+# routes/verify_answer.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import APIRouter, HTTPException, Depends
+from pymongo import UpdateOne
 from pydantic import BaseModel, Field
-from sympy import simplify, sympify
-from sympy.parsing.latex import parse_latex
-from sympy.core.sympify import SympifyError
+from dotenv import load_dotenv
 from routes.auth import get_current_user
-import re
+from routes.answer_verification import (
+    run_verification, run_verification_batch, run_compile, run_compile_batch, run_warm_up, correct_answer_pairs, VerificationError, ExpressionTimeout, CANONICAL_VERSION
+)
+from database import db
+from metrics import metrics
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Worker processes for SymPy verification, how many more requests may wait for one, and time limits in seconds
+VERIFY_ANSWER_WORKERS = int(os.getenv("VERIFY_ANSWER_WORKERS", "2"))
+VERIFY_ANSWER_QUEUE_LIMIT = int(os.getenv("VERIFY_ANSWER_QUEUE_LIMIT", "32"))
+VERIFY_ANSWER_EXPRESSION_TIMEOUT = float(os.getenv("VERIFY_ANSWER_EXPRESSION_TIMEOUT", "2"))
+VERIFY_ANSWER_REQUEST_TIMEOUT = float(os.getenv("VERIFY_ANSWER_REQUEST_TIMEOUT", "30"))
+# Start the workers and load SymPy in the background once the server is up, instead of on the first check
+VERIFY_ANSWER_WARMUP = os.getenv("VERIFY_ANSWER_WARMUP", "false").lower() in ("1", "true", "yes")
 
 router = APIRouter(prefix="/api/verify-answer", tags=["verify-answer"])
 
@@ -18,21 +42,225 @@ class VerifyAnswerRequest(BaseModel):
     correctAnswers: list[AnswerItem]  # Array of answer objects
     testAnswers: list[AnswerItem]  # Array of test answer objects
 
-def parse_answer(value: str, answer_type: str):
-    """Parse the answer based on its type, returning a SymPy expression or raw value."""
-    try:
-        if answer_type == "latex":
-            return simplify(parse_latex(value))
-        elif answer_type == "text":
-            # Attempt to convert text to a SymPy expression if it's a number
-            try:
-                return simplify(sympify(value))
-            except SympifyError:
-                return value  # Return raw string if not convertible
-        else:
-            raise ValueError(f"Unsupported answer type: {answer_type}")
-    except (SympifyError, ValueError, TypeError) as e:
-        raise ValueError(f"Invalid {answer_type} value '{value}': {str(e)}")
+class VerifyByQuestionRequest(BaseModel):
+    questionId: str
+    correctAnswerRelationship: str = "or"  # "or" or "and" for multiple correct answers
+    testAnswers: list[AnswerItem]  # Array of test answer objects
+
+class AnswerVerifierBusy(Exception):
+    """Raised when the verification pool already has as much work as it is allowed to queue."""
+
+class AnswerVerifier:
+    """
+    Runs verify_answers() on a pool of worker processes so parse_latex/simplify never run on
+    the event loop, however long they take. Inside a worker every parse and comparison is
+    limited to `expression_timeout` seconds; the whole call is also abandoned after
+    `request_timeout`. Either limit turns into a could_not_verify result. Once
+    workers + queue_limit jobs are in flight (including ones a worker is still running after
+    their caller gave up), new calls fail fast with AnswerVerifierBusy.
+    """
+    def __init__(self, workers: int = VERIFY_ANSWER_WORKERS, queue_limit: int = VERIFY_ANSWER_QUEUE_LIMIT,
+                 expression_timeout: float = VERIFY_ANSWER_EXPRESSION_TIMEOUT, request_timeout: float = VERIFY_ANSWER_REQUEST_TIMEOUT):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.expression_timeout = expression_timeout
+        self.request_timeout = request_timeout
+        self._executor = None
+        self._in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._worker_cache_stats = {}  # worker pid -> latest ExpressionCache.stats() from that worker
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Started on first use; spawn rather than fork, since the server process has running threads
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _could_not_verify(self, detail: str) -> dict:
+        self.timeouts += 1
+        metrics.inc("verify_answer.could_not_verify")
+        return {"isCorrect": None, "status": "could_not_verify", "detail": detail, "correctAnswers": [], "results": []}
+
+    async def _submit(self, fn, *args):
+        if self._in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            metrics.inc("verify_answer.rejected")
+            logger.warning(f"Answer verification pool saturated ({self._in_flight} in flight), rejecting request")
+            raise AnswerVerifierBusy()
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            job = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died while the pool was idle, so no request saw it; retry once on a fresh pool
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            job = executor.submit(fn, *args)
+        self._in_flight += 1
+        # Free the slot when the worker is done with the job, not when this call stops waiting:
+        # after a request timeout the worker keeps running it. The callback runs on the pool's
+        # management thread, hence call_soon_threadsafe.
+        job.add_done_callback(lambda _: self._release_threadsafe(loop))
+        try:
+            outcome = await asyncio.wait_for(asyncio.wrap_future(job), self.request_timeout)
+            self._worker_cache_stats[outcome["pid"]] = outcome["cache"]
+            return outcome["result"]
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory) while running this job; start a fresh pool for the next request
+            self._reset_executor(executor)
+            raise
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        # Another request may already have replaced the broken pool; keep its fresh one
+        if self._executor is broken:
+            logger.error("Answer verification worker died, restarting the pool")
+            self._executor = None
+            self._worker_cache_stats = {}
+        broken.shutdown(wait=False)
+
+    def _release(self):
+        self._in_flight -= 1
+
+    def _release_threadsafe(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # the event loop is already closed (shutdown)
+
+    async def verify(self, correct_answers: list, test_answers: list, relationship: str, canonical: dict = None) -> dict:
+        """Check test answers against (value, type) correct answers, or against a stored canonical form."""
+        started = time.perf_counter()
+        try:
+            result = await self._submit(run_verification, correct_answers, test_answers, relationship, self.expression_timeout, canonical)
+            result["status"] = "verified"
+            for answer in result["results"]:
+                metrics.inc(f"verify_answer.method.{answer['method']}")
+            return result
+        except ExpressionTimeout:
+            logger.warning(f"Answer verification gave up on an expression after {self.expression_timeout}s")
+            return self._could_not_verify(f"An expression took longer than {self.expression_timeout} s to check")
+        except asyncio.TimeoutError:
+            logger.warning(f"Answer verification did not finish within {self.request_timeout}s")
+            return self._could_not_verify(f"Verification took longer than {self.request_timeout} s")
+        except BrokenProcessPool:
+            return self._could_not_verify("The verification worker stopped unexpectedly")
+        finally:
+            metrics.observe("verify_answer.ms", (time.perf_counter() - started) * 1000)
+
+    async def verify_batch(self, items: list) -> list:
+        """
+        Check many (canonical, test_answers, relationship) items, e.g. a whole assignment,
+        split into one chunk per worker so they run in parallel. Results come back in item
+        order; a chunk that times out or loses its worker yields could_not_verify results.
+        Raises AnswerVerifierBusy up front unless every chunk can be admitted.
+        """
+        if not items:
+            return []
+        started = time.perf_counter()
+        chunks, outcomes = await self._submit_chunks(run_verification_batch, items)
+        results = [None] * len(items)
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.TimeoutError):
+                    detail = f"Verification took longer than {self.request_timeout} s"
+                elif isinstance(outcome, BrokenProcessPool):
+                    detail = "The verification worker stopped unexpectedly"
+                elif isinstance(outcome, AnswerVerifierBusy):
+                    detail = "Answer verification is busy"
+                else:
+                    raise outcome
+                logger.warning(f"Answer verification batch chunk of {len(chunk)} failed: {detail}")
+                outcome = [{"isCorrect": None, "status": "could_not_verify", "detail": detail, "correctAnswers": [], "results": []} for _ in chunk]
+            for i, result in zip(chunk, outcome):
+                results[i] = result
+        for result in results:
+            if result["status"] == "could_not_verify":
+                self.timeouts += 1
+                metrics.inc("verify_answer.could_not_verify")
+            for answer in result["results"]:
+                metrics.inc(f"verify_answer.method.{answer['method']}")
+        metrics.observe("verify_answer.batch_ms", (time.perf_counter() - started) * 1000)
+        return results
+
+    async def _submit_chunks(self, fn, items: list):
+        """
+        Run fn(chunk_items, expression_timeout) over one round-robin chunk of items per worker.
+        Returns (chunks of item indexes, outcome or exception per chunk); raises
+        AnswerVerifierBusy up front unless every chunk can be admitted.
+        """
+        chunk_count = min(self.workers, len(items))
+        if self._in_flight + chunk_count > self.workers + self.queue_limit:
+            self.rejected += 1
+            metrics.inc("verify_answer.rejected")
+            logger.warning(f"Answer verification pool saturated ({self._in_flight} in flight), rejecting batch of {len(items)}")
+            raise AnswerVerifierBusy()
+        chunks = [list(range(i, len(items), chunk_count)) for i in range(chunk_count)]
+        outcomes = await asyncio.gather(
+            *(self._submit(fn, [items[i] for i in chunk], self.expression_timeout) for chunk in chunks),
+            return_exceptions=True,
+        )
+        return chunks, outcomes
+
+    async def warm_up(self):
+        """Start every worker and run one check in each, so the first request does not pay for it."""
+        started = time.perf_counter()
+        await asyncio.gather(*(self._submit(run_warm_up) for _ in range(self.workers)))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("verify_answer.warm_up_ms", elapsed_ms)
+        logger.info(f"Answer verification pool warmed up {self.workers} workers in {elapsed_ms:.0f} ms")
+
+    async def compile(self, correct_answers: list) -> dict:
+        """Canonical form of (value, type) correct answers, for storing on the question."""
+        return await self._submit(run_compile, correct_answers, self.expression_timeout)
+
+    async def compile_batch(self, answer_lists: list) -> list:
+        """
+        compile() for many questions' (value, type) correct answers in one call per worker.
+        Entries whose chunk timed out or lost its worker are None.
+        """
+        if not answer_lists:
+            return []
+        chunks, outcomes = await self._submit_chunks(run_compile_batch, answer_lists)
+        compiled = [None] * len(answer_lists)
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, (asyncio.TimeoutError, BrokenProcessPool)):
+                logger.warning(f"Canonical answer compile chunk of {len(chunk)} failed: {type(outcome).__name__}")
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            for i, canonical in zip(chunk, outcome):
+                compiled[i] = canonical
+        return compiled
+
+    def cache_stats(self) -> dict:
+        """Expression cache totals across workers, as of each worker's last completed call."""
+        totals = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for stats in self._worker_cache_stats.values():
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        lookups = totals["hits"] + totals["misses"]
+        totals["hitRate"] = round(totals["hits"] / lookups, 4) if lookups else 0.0
+        return totals
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "rejected": self.rejected,
+            "couldNotVerify": self.timeouts,
+            "expressionCache": self.cache_stats(),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+answer_verifier = AnswerVerifier()
+metrics.gauge("verify_answer.pool", answer_verifier.stats)
 
 @router.post("/", response_model=dict)
 async def verify_answer(request: VerifyAnswerRequest, current_user: dict = Depends(get_current_user)):
@@ -47,98 +275,88 @@ async def verify_answer(request: VerifyAnswerRequest, current_user: dict = Depen
         if not request.testAnswers:
             raise HTTPException(status_code=400, detail="At least one test answer is required")
 
-        # Parse and simplify all correct answers
-        simplified_corrects = []
-        for i, ans in enumerate(request.correctAnswers):
-            if ans.value.strip():
-                try:
-                    simplified_corrects.append(parse_answer(ans.value, ans.type))
-                except ValueError as e:
-                    print(f"Failed to parse correctAnswer[{i}]: '{ans.value}' (type: {ans.type}) - Error: {str(e)}")
-                    continue  # Skip invalid entries
-
-        if not simplified_corrects:
-            raise HTTPException(status_code=400, detail="No valid correct answers provided")
-
-
-        # log the simplified correct answers for debugging
-        print("Simplified correct answers:", simplified_corrects)   
-
-        # Parse and simplify all test answers
-        simplified_tests = []
-        for i, ans in enumerate(request.testAnswers):
-            if ans.value.strip():
-                try:
-                    simplified_tests.append(parse_answer(ans.value, ans.type))
-                except ValueError as e:
-                    print(f"Failed to parse testAnswer[{i}]: '{ans.value}' (type: {ans.type}) - Error: {str(e)}")
-                    continue  # Skip invalid entries
-
-        if not simplified_tests:
-            raise HTTPException(status_code=400, detail="No valid test answers provided")
-
-        # log the simplified test answers for debugging
-        print("Simplified test answers:", simplified_tests) 
-
-        # Evaluate based on correctAnswerRelationship
-        results = []
-        if request.correctAnswerRelationship == "and":
-            if len(simplified_tests) != len(simplified_corrects):
-                raise HTTPException(status_code=400, detail="Number of test answers must match number of correct answers for 'and' relationship")
-            for i, (simplified_test, simplified_correct) in enumerate(zip(simplified_tests, simplified_corrects)):
-                # log the current test and correct answer for debugging
-                print(f"Comparing testAnswer[{i}]: '{simplified_test}' with correctAnswer[{i}]: '{simplified_correct}'")
-                is_correct = False
-                # Handle different types: compare symbolically or as strings if not convertible
-                if (isinstance(simplified_test, str) or isinstance(simplified_correct, str)) and not (simplified_test.is_number and simplified_correct.is_number):
-                    is_correct = str(simplified_test) == str(simplified_correct)
-                    #log the comparison result
-                    print(f"String comparison result for testAnswer[{i}]: {is_correct}")
-                else:
-                    is_correct = simplified_test.equals(simplified_correct)
-                    if simplified_test.is_number and simplified_correct.is_number:
-                        precision = 10
-                        rounded_test = round(float(simplified_test), precision)
-                        rounded_correct = round(float(simplified_correct), precision)
-                        is_correct = rounded_test == rounded_correct
-                # log the is_correct result
-                print(f"Is testAnswer[{i}] correct? {is_correct}")
-                results.append({
-                    "testAnswer": str(simplified_test),
-                    "isCorrect": is_correct,
-                    "expectedAnswer": str(simplified_correct)
-                })
-        elif request.correctAnswerRelationship == "or":
-            for simplified_test in simplified_tests:
-                is_correct = any(
-                    (isinstance(simplified_test, str) or isinstance(simplified_correct, str)) and not (simplified_test.is_number and simplified_correct.is_number) and str(simplified_test) == str(simplified_correct)
-                    or (not isinstance(simplified_test, str) and not isinstance(simplified_correct, str) and simplified_test.equals(simplified_correct))
-                    for simplified_correct in simplified_corrects
-                )
-                if all(simplified_correct.is_number for simplified_correct in simplified_corrects) and simplified_test.is_number:
-                    precision = 10
-                    rounded_test = round(float(simplified_test), precision)
-                    is_correct = any(
-                        round(float(simplified_correct), precision) == rounded_test
-                        for simplified_correct in simplified_corrects
-                    )
-                results.append({
-                    "testAnswer": str(simplified_test),
-                    "isCorrect": is_correct,
-                    "expectedAnswers": [str(simplified_correct) for simplified_correct in simplified_corrects]
-                })
-        else:
-            raise HTTPException(status_code=400, detail="Invalid correctAnswerRelationship: must be 'or' or 'and'")
-
-        # Determine overall isCorrect based on relationship and all test answers
-        overall_is_correct = all(result["isCorrect"] for result in results) if request.correctAnswerRelationship == "and" else any(result["isCorrect"] for result in results)
+        # Parsing and comparison run in the verification worker processes
+        return await answer_verifier.verify(
+            [(ans.value, ans.type) for ans in request.correctAnswers],
+            [(ans.value, ans.type) for ans in request.testAnswers],
+            request.correctAnswerRelationship,
+        )
+    except HTTPException:
+        raise
+    except AnswerVerifierBusy:
+        raise HTTPException(status_code=503, detail="Answer verification is busy, please retry", headers={"Retry-After": "1"})
+    except VerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Verification error: {str(e)}")
 
-        return {
-            "isCorrect": overall_is_correct,
-            "correctAnswers": [str(simplified_correct) for simplified_correct in simplified_corrects],
-            "results": results
-        }
-    except (SympifyError, ValueError, TypeError) as e:
-        raise HTTPException(status_code=400, detail=f"Invalid expression: {str(e)}")
+def _stored_canonical(question: dict):
+    canonical = question.get("canonicalAnswer")
+    return canonical if canonical and canonical.get("version") == CANONICAL_VERSION else None
+
+def _question_answer_pairs(question: dict) -> list:
+    correct_answer = question.get("correctAnswer") or []
+    if isinstance(correct_answer, str):
+        from routes.questions import normalize_legacy_fields
+        correct_answer = normalize_legacy_fields({"correctAnswer": correct_answer})["correctAnswer"]
+    return correct_answer_pairs(correct_answer)
+
+async def canonical_answer_for(question: dict):
+    """
+    The question's stored canonical correct answer, compiling and storing it first when it
+    is missing or was compiled by an older CANONICAL_VERSION.
+    """
+    canonical = _stored_canonical(question)
+    if canonical:
+        return canonical
+    canonical = await answer_verifier.compile(_question_answer_pairs(question))
+    await db.questions.update_one({"id": question["id"]}, {"$set": {"canonicalAnswer": canonical}})
+    metrics.inc("verify_answer.canonical_compiled_on_read")
+    return canonical
+
+async def canonical_answers_for(questions: list) -> list:
+    """
+    canonical_answer_for() for many questions: the missing ones are compiled together in one
+    batched pool call and stored with one bulk write. An entry is None if its compile failed.
+    """
+    canonicals = [_stored_canonical(question) for question in questions]
+    stale = [i for i, canonical in enumerate(canonicals) if canonical is None]
+    compiled = await answer_verifier.compile_batch([_question_answer_pairs(questions[i]) for i in stale])
+    updates = []
+    for i, canonical in zip(stale, compiled):
+        canonicals[i] = canonical
+        if canonical is not None:
+            updates.append(UpdateOne({"id": questions[i]["id"]}, {"$set": {"canonicalAnswer": canonical}}))
+    if updates:
+        await db.questions.bulk_write(updates, ordered=False)
+        metrics.inc("verify_answer.canonical_compiled_on_read", len(updates))
+    return canonicals
+
+@router.post("/by-question", response_model=dict)
+async def verify_answer_by_question(request: VerifyByQuestionRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Check a student's answer against a stored question. The correct side comes from the
+    question's precompiled canonicalAnswer, so only the test answers are parsed.
+    """
+    try:
+        request.testAnswers = [ans for ans in request.testAnswers if ans.value.strip()]
+        if not request.testAnswers:
+            raise HTTPException(status_code=400, detail="At least one test answer is required")
+        question = await db.questions.find_one({"id": request.questionId, "isActive": True}, {"_id": 0, "id": 1, "correctAnswer": 1, "canonicalAnswer": 1})
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
+        canonical = await canonical_answer_for(question)
+        return await answer_verifier.verify(
+            [],
+            [(ans.value, ans.type) for ans in request.testAnswers],
+            request.correctAnswerRelationship,
+            canonical=canonical,
+        )
+    except HTTPException:
+        raise
+    except AnswerVerifierBusy:
+        raise HTTPException(status_code=503, detail="Answer verification is busy, please retry", headers={"Retry-After": "1"})
+    except VerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Verification error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Verification error: {str(e)}")